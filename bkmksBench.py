@@ -0,0 +1,299 @@
+#!/usr/bin/python3
+#
+# benchmark bkmksConvert.py
+#
+# Generate synthetic bookmark files (netscape html, places json and places.sqlite) of a given
+# size, folder depth and icon density, then time separately, for each input format:
+#   - parse    : reading the file (the reader alone)
+#   - traverse : reading and traversing it (no files written)
+#   - write    : the whole conversion, into each of the output formats (.org, .url, .html, .webloc)
+# Each measurement runs in a fresh process, so its peak RSS is its own. The results are printed
+# as json (and appended as one json line to a file, to track them over time).
+#
+
+import os
+import sys
+import time
+import json
+import random
+import sqlite3
+import base64
+import argparse
+import platform
+import tempfile
+import subprocess
+from html import escape
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource                                                                # peak RSS, not available on windows
+except ImportError:
+    resource = None
+
+import bkmksConvert as bc
+
+words = ('alpha beta gamma delta news python linux recipe garden travel music cinema science physics history '
+         'bread cheese bicycle mountain river weather guide manual review forum blog archive paper talk').split()
+tlds  = ('com', 'org', 'net', 'io', 'co.uk', 'de', 'fr')
+
+# ------------------------------------------------------------------------- synthetic corpus
+
+def synthBookmarks(n, depth=4, fanout=4, iconDensity=0.1, seed=1):
+    """the events of a synthetic bookmark tree of n bookmarks in depth first order:
+       ('folder', title, date), ('end',) closing the folder, and ('bookmark', title, url, addDate, lastVisit, icon)
+       Folders nest depth deep with fanout sub-folders each, the bookmarks spread evenly over them.
+       A fraction iconDensity of the bookmarks have an icon, drawn from a small pool as real favicons repeat a lot.
+    """
+
+    rnd       = random.Random(seed)
+    left      = [n]
+    perFolder = max(1, n // sum(fanout**d for d in range(1, depth+1)))
+    icons     = ['data:image/png;base64,' + base64.b64encode(rnd.randbytes(rnd.randint(200, 2000))).decode() for _ in range(50)]
+    title     = lambda k: " ".join(rnd.choice(words) for _ in range(k)).capitalize()
+    date      = lambda: rnd.randint(1104537600, 1704067200)                        # 2005 - 2024
+
+    def folderEvents(level):
+        yield ('folder', title(2), date())
+        for _ in range(min(perFolder, left[0])):
+            left[0] -= 1
+            url       = f"https://{rnd.choice(words)}{rnd.randint(0, 999)}.example.{rnd.choice(tlds)}/{rnd.choice(words)}/{n-left[0]}.html"
+            addDate   = date()
+            icon      = rnd.choice(icons) if rnd.random()<iconDensity else None
+            yield ('bookmark', title(rnd.randint(2, 6)), url, addDate, addDate+rnd.randint(0, 10**8), icon)
+        if level<depth:
+            for _ in range(fanout):
+                if left[0]>0: yield from folderEvents(level+1)
+        yield ('end',)
+
+    while left[0]>0: yield from folderEvents(1)
+
+
+def writeHtml(htmlFile, events):
+    """write the events as a netscape bookmarks html file (as browsers export them)
+    """
+
+    with open(htmlFile, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+                '<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks Menu</H1>\n\n<DL><p>\n')
+        ind = '    '
+        for e in events:
+            if e[0]=='folder':
+                f.write(f'{ind}<DT><H3 ADD_DATE="{e[2]}">{escape(e[1])}</H3>\n{ind}<DL><p>\n')
+                ind += '    '
+            elif e[0]=='end':
+                ind = ind[:-4]
+                f.write(f'{ind}</DL><p>\n')
+            else:
+                _, name, url, addDate, lastVisit, icon = e
+                iconAttr = f' ICON="{icon}"' if icon else ''
+                f.write(f'{ind}<DT><A HREF="{escape(url)}" ADD_DATE="{addDate}" LAST_VISIT="{lastVisit}"{iconAttr}>{escape(name)}</A>\n')
+        f.write('</DL><p>\n')
+
+
+def writeJson(jsonFile, events):
+    """write the events as a firefox places json backup, streamed (never the whole tree in memory).
+       Places json has no inline icons, so iconDensity doesn't apply.
+    """
+
+    with open(jsonFile, 'w', encoding='utf-8') as f:
+        f.write('{"type": "text/x-moz-place-container", "title": "", "root": "placesRoot", "dateAdded": 1, "lastModified": 1, "children": [')
+        first = [True]                                                             # per open container: no child written yet
+        def sep():
+            if not first[-1]: f.write(', ')
+            first[-1] = False
+        for e in events:
+            if e[0]=='folder':
+                sep()
+                f.write(json.dumps({'type':'text/x-moz-place-container', 'title':e[1], 'dateAdded':e[2]*1000000, 'lastModified':e[2]*1000000})[:-1] + ', "children": [')
+                first.append(True)
+            elif e[0]=='end':
+                first.pop()
+                f.write(']}')
+            else:
+                sep()
+                _, name, url, addDate, lastVisit, icon = e
+                f.write(json.dumps({'type':'text/x-moz-place', 'title':name, 'uri':url, 'dateAdded':addDate*1000000, 'lastModified':lastVisit*1000000}))
+        f.write(']}\n')
+
+
+def writeSqlite(dbFile, events, batchSize=10000):
+    """write the events as the moz_bookmarks and moz_places tables of a places.sqlite
+       (favicons live in a separate favicons.sqlite in firefox, so iconDensity doesn't apply)
+    """
+
+    if os.path.exists(dbFile): os.remove(dbFile)
+    conn = sqlite3.connect(dbFile)
+    conn.executescript("""
+        CREATE TABLE moz_places    (id INTEGER PRIMARY KEY, url LONGVARCHAR, title LONGVARCHAR, last_visit_date INTEGER);
+        CREATE TABLE moz_bookmarks (id INTEGER PRIMARY KEY, type INTEGER, fk INTEGER DEFAULT NULL, parent INTEGER, position INTEGER,
+                                    title LONGVARCHAR, dateAdded INTEGER, lastModified INTEGER);
+        CREATE INDEX moz_bookmarks_itemindex ON moz_bookmarks (fk, type);
+        CREATE INDEX moz_bookmarks_parentindex ON moz_bookmarks (parent, position);""")
+    bkmks, places = [(1, 2, None, 0, 0, '', 1, 1)], []                             # places root
+    parents, positions, nextId = [1], [0], 2
+    for e in events:
+        if e[0]=='end':
+            parents.pop(); positions.pop()
+            continue
+        pos = positions[-1]; positions[-1] += 1
+        if e[0]=='folder':
+            bkmks.append((nextId, 2, None, parents[-1], pos, e[1], e[2]*1000000, e[2]*1000000))
+            parents.append(nextId); positions.append(0)
+        else:
+            _, name, url, addDate, lastVisit, icon = e
+            places.append((nextId, url, name, lastVisit*1000000))
+            bkmks.append((nextId, 1, nextId, parents[-1], pos, name, addDate*1000000, lastVisit*1000000))
+        nextId += 1
+        if len(bkmks)>=batchSize:
+            conn.executemany("INSERT INTO moz_places VALUES (?,?,?,?)", places)
+            conn.executemany("INSERT INTO moz_bookmarks VALUES (?,?,?,?,?,?,?,?)", bkmks)
+            bkmks, places = [], []
+    conn.executemany("INSERT INTO moz_places VALUES (?,?,?,?)", places)
+    conn.executemany("INSERT INTO moz_bookmarks VALUES (?,?,?,?,?,?,?,?)", bkmks)
+    conn.commit()
+    conn.close()
+
+
+corpusWriters = {'html':('.html', writeHtml), 'json':('.json', writeJson), 'sqlite':('.sqlite', writeSqlite)}
+
+def makeCorpus(workDir, formats, n, depth, fanout, iconDensity, seed):
+    """write the synthetic corpus in each format into workDir (the same tree for every format), returns {format: file}
+    """
+
+    corpus = {}
+    for fmt in formats:
+        sfx, writer = corpusWriters[fmt]
+        corpus[fmt] = Path(workDir) / f"bench_{n}{sfx}"
+        writer(corpus[fmt], synthBookmarks(n, depth, fanout, iconDensity, seed))
+    return corpus
+
+# ------------------------------------------------------------------------- measurements
+
+class NullExporter:
+    """stands in for bkmksConvert's exporter so that a traversal writes nothing
+    """
+
+    def folder(self, depth, name): pass
+    def bookmark(self, *bkmk):     pass
+
+
+def peakRssMB():
+    if resource is None: return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(maxrss / (1<<20 if sys.platform=='darwin' else 1<<10), 1)     # bytes on macos, KiB elsewhere
+
+
+def measure(inFile, fmt, stage, outFmt=None, stream=False, workDir=None):
+    """run one stage of one conversion (in the calling process, see runMeasurement), returns (seconds, peak RSS MB)
+    """
+
+    convArgs = [str(inFile)] + (['-s'] if stream else []) + ['-oo']
+    bc.initBatchWorker(bc.makeArgParser().parse_args(convArgs))                   # set bkmksConvert's args, silence its progress output
+
+    with tempfile.TemporaryDirectory(dir=workDir) as writeFldr:
+        start = time.perf_counter()
+        if stage=='parse':
+            if   fmt=='sqlite':           sum(1 for _ in bc.readSqliteBookmarks(inFile))
+            elif fmt=='json' and stream:  sum(1 for _ in bc.readJsonEvents(inFile))
+            elif fmt=='json':             bc.readJsonBookmarks(inFile)
+            elif fmt=='html' and stream:  sum(1 for _ in bc.iterHtmlBookmarks(inFile))
+            else:                         bc.readHtmlBookmarks(inFile)
+        elif stage=='traverse':
+            bc.exporter = NullExporter()
+            bc.traverseFile(inFile, Path('.'), '.org')
+            bc.exporter = None
+        else:
+            bc.convertFile(inFile, writeFldr, outFmt)
+        seconds = time.perf_counter() - start                                     # (not counting the clean up of the written files)
+
+    return seconds, peakRssMB()
+
+
+def runMeasurement(*measureArgs, **measureKwArgs):
+    """measure in a fresh process, so every measurement starts cold and has its own peak RSS
+    """
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(measure, *measureArgs, **measureKwArgs).result()
+
+
+def runBenchmarks(corpus, n, outFmts, stream=False, repeat=1, workDir=None):
+    """time parse, traverse and write (into each of outFmts) of each file of corpus, the best of repeat runs.
+       seconds is the time of the whole run, stageSeconds that of the stage alone (less the time of the stage before)
+    """
+
+    results = []
+    for fmt, inFile in corpus.items():
+        prevSecs = 0.0
+        for stage, outFmt in [('parse', None), ('traverse', None)] + [('write', '.'+o) for o in outFmts]:
+            runs    = [runMeasurement(inFile, fmt, stage, outFmt=outFmt, stream=stream, workDir=workDir) for _ in range(repeat)]
+            seconds = min(r[0] for r in runs)
+            rss     = max((r[1] for r in runs if r[1] is not None), default=None)
+            results.append({'format':fmt, 'stage':stage, 'outFmt':outFmt, 'seconds':round(seconds, 4),
+                            'stageSeconds':round(max(seconds-prevSecs, 0.0), 4), 'rows':n,
+                            'rowsPerSec':round(n/seconds) if seconds else None, 'peakRssMB':rss})
+            print(f"{fmt:7} {stage:9} {outFmt or '':8} {seconds:9.3f}s {results[-1]['rowsPerSec'] or 0:>10} rows/s {rss or 0:>8} MB", file=sys.stderr)
+            if stage!='write': prevSecs = seconds                                 # write stages all build on the traverse
+    return results
+
+
+def gitRevision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+# ------------------------------------------------------------------------------ main
+
+if __name__ == "__main__":
+
+    descrip = '''
+     For example:
+       ./bkmksBench.py                                     (10000 bookmarks, all formats)
+       ./bkmksBench.py -n 200000 --formats html --stream  -o benchHistory.jsonl
+       ./bkmksBench.py -n 1000000 --generateOnly -w ./bigCorpus
+    '''
+
+    parser = argparse.ArgumentParser(
+        prog='bkmksBench.py',
+        description='time parsing, traversing and writing of synthetic bookmark files by bkmksConvert.py, results as json',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=descrip)
+
+    parser.add_argument('-n',  '--bookmarks', type=int,   default=10000, help='number of bookmarks in the corpus (default 10000)')
+    parser.add_argument('-d',  '--depth',     type=int,   default=4,     help='depth of the folder tree (default 4)')
+    parser.add_argument('-f',  '--fanout',    type=int,   default=4,     help='sub-folders per folder (default 4)')
+    parser.add_argument(       '--icons',     type=float, default=0.1,   help='fraction of bookmarks with an inline icon, html only (default 0.1)')
+    parser.add_argument(       '--seed',      type=int,   default=1)
+    parser.add_argument(       '--formats',   nargs='+',  default=list(corpusWriters), choices=list(corpusWriters), help='input formats to benchmark')
+    parser.add_argument(       '--outFmts',   nargs='+',  default=['org', 'url', 'html', 'webloc'], choices=['org', 'url', 'html', 'webloc'], help='output formats to write')
+    parser.add_argument('-s',  '--stream',    action='store_true', help='benchmark the streaming readers (bkmksConvert.py --stream)')
+    parser.add_argument('-r',  '--repeat',    type=int,   default=1,     help='runs per measurement, the fastest is reported')
+    parser.add_argument('-w',  '--workDir',   type=str,   default=None,  help='folder for the corpus and the written files (default: a temporary folder)')
+    parser.add_argument(       '--generateOnly', action='store_true', help='only generate the corpus (into --workDir)')
+    parser.add_argument('-o',  '--output',    type=str,   default=None,  help='also append the results as one json line to this file')
+
+    args = parser.parse_args()
+
+    tmpDir  = None if args.workDir else tempfile.TemporaryDirectory()
+    workDir = args.workDir or tmpDir.name
+    os.makedirs(workDir, exist_ok=True)
+
+    start  = time.perf_counter()
+    corpus = makeCorpus(workDir, args.formats, args.bookmarks, args.depth, args.fanout, args.icons, args.seed)
+    print(f"generated {args.bookmarks} bookmarks as {', '.join(str(f) for f in corpus.values())} in {time.perf_counter()-start:.1f}s", file=sys.stderr)
+
+    if not args.generateOnly:
+        report = {'timestamp':  time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'revision':   gitRevision(),
+                  'python':     platform.python_version(),
+                  'platform':   platform.platform(),
+                  'corpus':     {'bookmarks':args.bookmarks, 'depth':args.depth, 'fanout':args.fanout, 'iconDensity':args.icons, 'seed':args.seed},
+                  'stream':     args.stream,
+                  'results':    runBenchmarks(corpus, args.bookmarks, args.outFmts, stream=args.stream, repeat=args.repeat, workDir=workDir)}
+        print(json.dumps(report, indent=1))
+        if args.output:
+            with open(args.output, 'a') as f: f.write(json.dumps(report) + "\n")
+
+    if tmpDir: tmpDir.cleanup()
@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+#
+# on-disk cache of parsed bookmark inputs, for repeat conversions of the same exports
+#
+# Used by bkmksConvert.py (--parseCache): the first conversion of an input records the node stream its reader yields
+# (see dftNodes), later ones of the same content, into any output format, replay the nodes instead of parsing again.
+# Inputs are keyed by the sha256 of their content (with an sqlite file's -wal, which holds its latest commits); a path
+# seen before with the same size and mtime (of the file, its -wal and -shm) maps to its hash without reading the file.
+# Icons (data: uris, often the same for many bookmarks) are kept once. The least recently used inputs are evicted
+# beyond a size limit. An input is recorded by one process at a time, the others (e.g. batch workers given copies of
+# one export) read it directly meanwhile.
+#
+
+import os
+import time
+import sqlite3
+import hashlib
+
+defaultParseCacheFile = f"{os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')}/bkmksConvert/parseCache.sqlite"
+parseCacheVersion     = 1                                                         # bump when the readers change what they produce, older entries are then misses
+
+parseCacheSchema = """
+    CREATE TABLE IF NOT EXISTS inputs (hash TEXT PRIMARY KEY, size INTEGER, reader TEXT, version INTEGER, complete INTEGER, nodes INTEGER, bytes INTEGER, lastUsed REAL, owner INTEGER);
+    CREATE TABLE IF NOT EXISTS paths  (path TEXT PRIMARY KEY, stamp TEXT, hash TEXT);
+    CREATE TABLE IF NOT EXISTS nodes  (hash TEXT, seq INTEGER, depth, name, dateAdded, url, isFolder, lastModified, lastVisited,
+                                       iconUri, icon, lastCharset, description, PRIMARY KEY(hash, seq)) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS icons  (digest TEXT PRIMARY KEY, icon TEXT);"""
+                                                                                  # (untyped columns keep each value's type, '123' stays a str)
+
+detailKeys = ('iconUri', 'icon', 'lastCharset', 'description')                   # the keys of a node's details, columns of table nodes
+sideFiles  = ('', '-wal', '-shm')                                                 # an sqlite database is its file, its write-ahead log and its index
+contentSideFiles = ('', '-wal')                                                   # (the -shm is rebuilt from the -wal)
+
+
+def processAlive(pid):
+    if os.name!='posix': return True                                              # (os.kill would terminate it on windows) assume so
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:                                                       # someone else's
+        pass
+    return True
+
+
+class ParseCache:
+    """the recorded nodes of each input (table nodes), its entry (inputs) and the paths known to have its content (paths).
+       A node is stored as (depth, name, dateAdded, url, isFolder, lastModified, lastVisited, iconUri, icon, lastCharset, description),
+       its details spread over the last four columns; the icon column holds the digest of the icon in table icons.
+    """
+
+    batchSize = 10000
+
+    def __init__(self, cacheFile=defaultParseCacheFile, maxBytes=1<<30):
+        os.makedirs(os.path.dirname(os.path.abspath(cacheFile)), exist_ok=True)
+        self.conn     = sqlite3.connect(cacheFile, timeout=60)                    # (batch conversions share it from several processes)
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")                       # (only takes effect on a new file) evicted pages are given back
+        self.conn.execute("PRAGMA journal_mode=WAL")                              # readers replay while another process records
+        self.conn.executescript(parseCacheSchema)
+        self.maxBytes = maxBytes
+        self.batch    = []
+        self.key      = None                                                      # hash of the input being recorded
+        self.seq      = 0
+        self.bytes    = 0
+        self.icons    = set()                                                     # digests of the icons of the input being recorded
+
+    def lookup(self, inFile):
+        """(hash of inFile's content, whether its nodes are cached), the content is only hashed for a path not seen with this
+           size and mtime. For an sqlite file these include its -wal and -shm: commits not yet checkpointed are only in the -wal
+        """
+
+        path  = os.path.abspath(inFile)
+        stamp = repr([(st.st_size, st.st_mtime_ns) if (st := fileStat(path+side)) else None for side in sideFiles])
+        row   = self.conn.execute("SELECT hash FROM paths WHERE path=? AND stamp=?", (path, stamp)).fetchone()
+        if row: key = row[0]
+        else:
+            digest = hashlib.sha256()
+            for side in contentSideFiles:
+                if side and not os.path.exists(path+side): continue
+                digest.update(side.encode())                                      # (the main file's content can't pass for a -wal's)
+                with open(path+side, 'rb') as f:
+                    while chunk := f.read(1<<20): digest.update(chunk)
+            key = digest.hexdigest()
+            self.conn.execute("INSERT OR REPLACE INTO paths(path, stamp, hash) VALUES (?,?,?)", (path, stamp, key))
+            self.conn.commit()
+        hit = self.conn.execute("SELECT 1 FROM inputs WHERE hash=? AND complete=1 AND version=?", (key, parseCacheVersion)).fetchone()
+        return key, bool(hit)
+
+    def begin(self, key, size, reader):
+        """claim the recording of the nodes of the input with this hash, replacing whatever was kept of it. False if another
+           (live) process is recording it, or has just completed it: the caller reads the input itself then
+        """
+
+        self.conn.execute("BEGIN IMMEDIATE")                                      # the check and the claim as one write transaction
+        try:
+            row = self.conn.execute("SELECT complete, version, owner FROM inputs WHERE hash=?", (key,)).fetchone()
+            if row and ((row[0] and row[1]==parseCacheVersion) or (not row[0] and row[2] and row[2]!=os.getpid() and processAlive(row[2]))):
+                self.conn.rollback()
+                return False
+            self.conn.execute("DELETE FROM nodes  WHERE hash=?", (key,))
+            self.conn.execute("DELETE FROM inputs WHERE hash=?", (key,))
+            self.conn.execute("INSERT INTO inputs(hash, size, reader, version, complete, nodes, bytes, lastUsed, owner) VALUES (?,?,?,?,0,0,0,?,?)",
+                              (key, size, reader, parseCacheVersion, time.time(), os.getpid()))
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.batch = []
+        self.key, self.seq, self.bytes, self.icons = key, 0, 0, set()
+        return True
+
+    def record(self, nodes):
+        """pass a reader's node stream through, recording each node under the claimed hash (see begin). Should the cache
+           fail, the recording is dropped and the nodes still passed on
+        """
+
+        for node in nodes:
+            if self.key is not None:
+                try:
+                    self.add(node)
+                except sqlite3.Error:
+                    self.abandon()
+            yield node
+
+    def add(self, node):
+        if len(self.batch)>=self.batchSize: self.flush()
+        depth, name, dateAdded, url, isFolder, lastModified, lastVisited, details = node
+        self.batch.append([self.key, self.seq, depth, name, dateAdded, url, int(isFolder), lastModified, lastVisited,
+                           *((details.get(k) for k in detailKeys) if details else (None,)*len(detailKeys))])
+        self.seq += 1
+
+    def flush(self):
+        if not self.batch: return
+        icons = {}
+        for row in self.batch:
+            if row[10] is None: continue
+            digest  = hashlib.sha1(str(row[10]).encode()).hexdigest()
+            if digest not in self.icons: icons[digest] = row[10]
+            row[10] = digest
+        self.bytes += sum(len(str(v)) for row in self.batch for v in row[2:] if v is not None) + sum(len(str(v)) for v in icons.values())
+                                                                                  # (about what the rows take, enough to bound the cache)
+        try:
+            self.conn.executemany("INSERT OR IGNORE INTO icons(digest, icon) VALUES (?,?)", icons.items())
+            self.conn.executemany("INSERT INTO nodes VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", self.batch)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()                                                  # don't hold the write lock of a failed batch
+            raise
+        finally:
+            self.batch = []
+        self.icons.update(icons)
+
+    def finish(self):
+        """the recording is complete: make it usable, and evict beyond the size limit
+        """
+
+        if self.key is None: return                                               # (dropped on a cache error)
+        try:
+            self.flush()
+            self.conn.execute("UPDATE inputs SET complete=1, nodes=?, bytes=?, lastUsed=?, owner=NULL WHERE hash=?", (self.seq, self.bytes, time.time(), self.key))
+            self.conn.commit()
+        except sqlite3.Error:
+            self.abandon()
+            return
+        self.key = None
+        self.evict()
+
+    def abandon(self):
+        """drop the recording in progress (a reader or cache error), as far as the cache lets it
+        """
+
+        if self.key is None: return
+        try:
+            self.discard(self.key)
+        except sqlite3.Error:                                                     # (left unclaimed once this process is gone)
+            self.batch, self.key = [], None
+
+    def nodes(self, key):
+        """the recorded node stream of an input (marking it as just used)
+        """
+
+        self.conn.execute("UPDATE inputs SET lastUsed=? WHERE hash=?", (time.time(), key))
+        self.conn.commit()
+        for *node, iconUri, icon, lastCharset, description in self.conn.execute("""
+                SELECT depth, name, dateAdded, url, isFolder, lastModified, lastVisited, iconUri, i.icon, lastCharset, description
+                  FROM nodes n LEFT JOIN icons i ON i.digest=n.icon
+                 WHERE hash=? ORDER BY seq""", (key,)):
+            details = {k:v for k,v in zip(detailKeys, (iconUri, icon, lastCharset, description)) if v is not None}
+            node[4] = bool(node[4])
+            yield (*node, details or None)
+
+    def discard(self, key):
+        self.batch = []
+        if key==self.key: self.key = None
+        try:
+            self.conn.execute("DELETE FROM nodes  WHERE hash=?", (key,))
+            self.conn.execute("DELETE FROM inputs WHERE hash=?", (key,))
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def evict(self):
+        """drop the least recently used inputs until the complete ones fit in maxBytes
+        """
+
+        total   = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM inputs WHERE complete=1").fetchone()[0]
+        evicted = 0
+        for key, size in self.conn.execute("SELECT hash, bytes FROM inputs WHERE complete=1 ORDER BY lastUsed").fetchall():
+            if total<=self.maxBytes: break
+            self.discard(key)
+            self.conn.execute("DELETE FROM paths WHERE hash=?", (key,))
+            total   -= size
+            evicted += 1
+        if evicted:
+            self.conn.execute("DELETE FROM icons WHERE digest NOT IN (SELECT icon FROM nodes WHERE icon IS NOT NULL)")
+            self.conn.commit()
+            self.conn.executescript("PRAGMA incremental_vacuum")                    # (run to completion, execute would free one page)
+
+    def close(self):
+        self.conn.close()
+
+
+def fileStat(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,200 @@
+#!/usr/bin/python3
+#
+# link liveness checker for bookmarks
+#
+# Checks urls with a small asyncio HTTP/1.1 client: connections are pooled (kept alive) per host, with a limit on the
+# requests in flight per host and overall, a HEAD first and a GET when the HEAD fails or is refused, and redirects
+# followed. The results are kept in an sqlite cache so that a re-run skips the urls checked within the ttl.
+# Used by openUrlFile.py (check), which also writes the results into the bookmark files.
+#
+
+import os
+import ssl
+import time
+import sqlite3
+import asyncio
+from urllib.parse import urlsplit, urljoin, quote
+
+defaultCheckFile = f"{os.path.expanduser('~')}/history/bookmarksCheck.sqlite"   # next to openUrlFile.py's browse log
+userAgent        = "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"  # some sites refuse unknown agents
+redirectStatuses = (301, 302, 303, 307, 308)
+maxBodyKeep      = 1<<16                                                         # a GET body up to this size is read, so its connection can be reused
+
+
+class CheckCache:
+    """the result of the last check of each url: status (None if no response), final url (after redirects), error, and when
+    """
+
+    batchSize = 500
+
+    def __init__(self, cacheFile=defaultCheckFile, ttl=7*86400):
+        os.makedirs(os.path.dirname(os.path.abspath(cacheFile)), exist_ok=True)
+        self.conn  = sqlite3.connect(cacheFile, timeout=60)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS checks (url TEXT PRIMARY KEY, status INTEGER, finalUrl TEXT, error TEXT, checked REAL)")
+        self.ttl   = ttl
+        self.batch = []
+
+    def fresh(self, urls):
+        """{url: (status, finalUrl, error, checked)} of those of urls checked within the ttl
+        """
+        self.flush()
+        since, urls, found = time.time()-self.ttl, list(urls), {}
+        for i in range(0, len(urls), 500):                                        # (sqlite's limit on parameters)
+            part = urls[i:i+500]
+            found.update((row[0], row[1:]) for row in self.conn.execute(
+                f"SELECT url, status, finalUrl, error, checked FROM checks WHERE checked>=? AND url IN ({','.join('?'*len(part))})", [since]+part))
+        return found
+
+    def put(self, url, result):
+        self.batch.append((url,)+tuple(result))
+        if len(self.batch)>=self.batchSize: self.flush()
+
+    def flush(self):
+        if not self.batch: return
+        self.conn.executemany("INSERT OR REPLACE INTO checks(url, status, finalUrl, error, checked) VALUES (?,?,?,?,?)", self.batch)
+        self.conn.commit()
+        self.batch = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+class HttpPool:
+    """HTTP/1.1 requests over kept alive connections, pooled per (scheme, host, port). At most perHost requests are in
+       flight to one host and concurrency overall. Only the status and headers are wanted, bodies are read (small ones)
+       or the connection dropped.
+    """
+
+    def __init__(self, concurrency=64, perHost=4, timeout=10.0):
+        self.timeout    = timeout
+        self.perHost    = perHost
+        self.inFlight   = asyncio.Semaphore(concurrency)
+        self.hostLimits = {}                                                      # (scheme, host, port): Semaphore
+        self.idle       = {}                                                      # (scheme, host, port): [(reader, writer) ..]
+        self.sslContext = ssl.create_default_context()
+
+    async def request(self, method, url):
+        """(status, headers) of the response to method on url, headers with lower case names
+        """
+        parts  = urlsplit(url)
+        https  = parts.scheme=='https'
+        host   = parts.hostname.encode('idna').decode('ascii')
+        port   = parts.port or (443 if https else 80)
+        key    = (parts.scheme, host, port)
+        target = quote((parts.path or '/') + ('?'+parts.query if parts.query else ''), safe="!#$%&'()*+,/:;=?@[]~")
+        hostHd = host if parts.port is None else f"{host}:{port}"
+        reqst  = (f"{method} {target} HTTP/1.1\r\nHost: {hostHd}\r\nUser-Agent: {userAgent}\r\n"
+                  f"Accept: */*\r\nConnection: keep-alive\r\n\r\n").encode('latin-1', 'replace')
+
+        async with self.hostLimits.setdefault(key, asyncio.Semaphore(self.perHost)), self.inFlight:  # (waiting for a busy host doesn't hold an overall slot)
+            idle = self.idle.setdefault(key, [])
+            while True:
+                reused = bool(idle)
+                if reused: reader, writer = idle.pop()
+                else:      reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=self.sslContext if https else None), self.timeout)
+                try:
+                    writer.write(reqst)
+                    status, headers, keep = await asyncio.wait_for(self.response(reader, method), self.timeout)
+                except Exception as e:
+                    writer.close()
+                    if reused and not isinstance(e, asyncio.TimeoutError): continue  # the server closed the idle connection: a new one
+                    raise
+                if keep: idle.append((reader, writer))
+                else:    writer.close()
+                return status, headers
+
+    async def response(self, reader, method):
+        """read the status line, headers and (small) body: (status, headers, whether the connection can be reused)
+        """
+        statusLine = (await reader.readline()).decode('latin-1').split(None, 2)
+        if len(statusLine)<2 or not statusLine[0].startswith('HTTP/'): raise ConnectionError(f"bad status line {statusLine}")
+        status, headers = int(statusLine[1]), {}
+        while True:
+            ln = await reader.readline()
+            if not ln: raise ConnectionError("connection closed in the headers")
+            if ln in (b'\r\n', b'\n'): break
+            name, _, value = ln.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep = statusLine[0]=='HTTP/1.1' and headers.get('connection', '').lower()!='close'
+        if method=='HEAD' or status in (204, 304) or status<200: return status, headers, keep
+        length = headers.get('content-length')
+        if length and length.isdigit() and int(length)<=maxBodyKeep and 'transfer-encoding' not in headers:
+            await reader.readexactly(int(length))
+            return status, headers, keep
+        return status, headers, False                                            # chunked, big or unknown length: not worth reading
+
+    def close(self):
+        for conns in self.idle.values():
+            for reader, writer in conns: writer.close()
+        self.idle = {}
+
+
+async def checkUrl(pool, url, maxRedirects=5):
+    """(status, finalUrl, error, checked) of url: HEAD, or GET when the HEAD fails or is refused (405, 403 ..), following redirects.
+       status None when there is no response (error says why)
+    """
+    status, error, current = None, None, url
+    try:
+        for _ in range(maxRedirects+1):
+            try:
+                status, headers = await pool.request('HEAD', current)
+            except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                status = None
+            if status is None or status>=400:                                     # many servers mishandle HEAD
+                status, headers = await pool.request('GET', current)
+            if status in redirectStatuses and headers.get('location'):
+                current = urljoin(current, headers['location'])
+                continue
+            break
+        else:
+            error = "too many redirects"
+    except asyncio.TimeoutError:
+        status, error = None, "timeout"
+    except Exception as e:                                                        # dns, refused, tls, bad response ..
+        status, error = None, f"{type(e).__name__}: {e}".strip(': ')
+    return status, (current if current!=url else None), error, time.time()
+
+
+async def checkUrlsAsync(urls, cache=None, concurrency=64, perHost=4, timeout=10.0, progress=None):
+    pool    = HttpPool(concurrency, perHost, timeout)
+    results = {}
+    todo    = iter(urls)
+
+    async def worker():                                                           # a few times concurrency of them, rather than a task per url
+        for url in todo:
+            results[url] = await checkUrl(pool, url)
+            if cache: cache.put(url, results[url])
+            if progress: progress(url, results[url])
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(len(urls), concurrency*4))))
+    finally:
+        pool.close()
+    return results
+
+
+def isHttpUrl(url):
+    try:
+        parts = urlsplit(url)
+        return parts.scheme in ('http', 'https') and bool(parts.hostname)
+    except ValueError:                                                            # e.g. a broken ipv6 address
+        return False
+
+
+def checkUrls(urls, cache=None, concurrency=64, perHost=4, timeout=10.0, progress=None):
+    """{url: (status, finalUrl, error, checked)} of the http(s) ones of urls, those checked within the cache's ttl are not
+       checked again. progress(url, result) is called as each check completes
+    """
+    urls    = list(dict.fromkeys(u for u in urls if u and isHttpUrl(u)))
+    results = cache.fresh(urls) if cache else {}
+    todo    = [u for u in urls if u not in results]
+    if todo: results.update(asyncio.run(checkUrlsAsync(todo, cache, concurrency, perHost, timeout, progress)))
+    if cache: cache.flush()
+    return results
+
+
+def isAlive(result):
+    status, finalUrl, error, checked = result
+    return status is not None and status<400 and not error             # (a redirect loop has a 3xx status and an error)
@@ -0,0 +1,339 @@
+#!/usr/bin/python3
+#
+# self-test of bkmksCheck.py and openUrlFile.py check against a local http server
+#
+# Serves (on 127.0.0.1, a free port) pages that answer HEAD and GET as real servers do - ok, HEAD refused, missing,
+# redirect chains and loops, slow, big bodies, connections closed while idle - and checks what checkUrls makes of each,
+# how many connections it opened (pooling) and how many requests it had in flight to the host at once (--perHost).
+# Then checks how the results are written into url files of each format (write_check_meta, and the check sub-command):
+# the files keep their mtime and everything else in them. Prints one line per check and exits with status 1 if any failed.
+#
+
+import os
+import re
+import sys
+import time
+import socket
+import plistlib
+import argparse
+import tempfile
+import threading
+import subprocess
+import configparser
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bkmksCheck as bk
+import openUrlFile as ouf
+
+# ------------------------------------------------------------------------- test server
+
+class TestServer(ThreadingHTTPServer):
+    """counts the connections accepted, the requests made (by method and path) and the most in flight at once
+    """
+
+    daemon_threads = True
+
+    def __init__(self, slowSeconds):
+        super().__init__(('127.0.0.1', 0), TestHandler)
+        self.slowSeconds = slowSeconds
+        self.lock        = threading.Lock()
+        self.connections = 0
+        self.requests    = []                                                     # (method, path)
+        self.inFlight    = self.maxInFlight = 0
+
+    def get_request(self):
+        conn = super().get_request()
+        with self.lock: self.connections += 1
+        return conn
+
+    def handle_error(self, request, client_address):
+        pass                                                                      # (clients giving up on slow pages)
+
+
+class TestHandler(BaseHTTPRequestHandler):
+    """/ok, /noHead (405 to a HEAD), /missing (404), /redirect/<n> (n redirects, then ok), /loop (redirects to itself),
+       /slow (answers after the server's slowSeconds), /busy (answers after 0.2s), /big (a body too big to keep the connection),
+       /drop (closes the connection after answering, without saying so)
+    """
+
+    protocol_version = 'HTTP/1.1'                                                 # keep-alive
+
+    def do_HEAD(self): self.answer(head=True)
+    def do_GET(self):  self.answer(head=False)
+
+    def answer(self, head):
+        srv  = self.server
+        path = self.path.split('?')[0]
+        with srv.lock:
+            srv.requests.append((self.command, path))
+            srv.inFlight   += 1
+            srv.maxInFlight = max(srv.maxInFlight, srv.inFlight)
+        try:
+            body, headers = b'', {}
+            if   path=='/ok':      status = 200
+            elif path=='/noHead':  status = 405 if head else 200
+            elif path=='/missing': status = 404
+            elif path=='/loop':    status, headers = 302, {'Location': '/loop'}
+            elif path.startswith('/redirect/'):
+                n = int(path.rsplit('/', 1)[1])
+                status, headers = (301, {'Location': f"/redirect/{n-1}"}) if n>0 else (200, {})
+            elif path=='/slow':
+                time.sleep(srv.slowSeconds)
+                status = 200
+            elif path=='/busy':
+                time.sleep(0.2)
+                status = 200
+            elif path=='/big':     status, body = 200, b'x' * (bk.maxBodyKeep+1)
+            elif path=='/drop':
+                status = 200
+                self.close_connection = True                                      # (still answered as keep-alive)
+            else:                  status = 500
+        finally:
+            with srv.lock: srv.inFlight -= 1
+        self.send_response(status)
+        for name, value in headers.items(): self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head: self.wfile.write(body)
+
+    def log_message(self, format, *logArgs):
+        pass
+
+# ------------------------------------------------------------------------- checks
+
+def freePort():
+    """a port nothing listens on (for a refused connection)
+    """
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def checker(results, verbose):
+    """check(name, passed, detail): adds the result to results and prints it
+    """
+
+    def check(name, passed, detail=''):
+        results.append((name, bool(passed), detail))
+        print(f"{'ok  ' if passed else 'FAIL'} {name}{'  ('+str(detail)+')' if detail and (verbose or not passed) else ''}")
+    return check
+
+
+def serve(timeout):
+    """a TestServer answering on a thread, and its base url
+    """
+    srv = TestServer(slowSeconds=timeout*4)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+def runChecks(timeout=1.0, verbose=False):
+    """run each check of checkUrls against a fresh server, the list of (name, passed, detail)
+    """
+
+    results = []
+    check   = checker(results, verbose)
+
+    def checkOne(srv, base, path, **kwArgs):
+        url = base + path
+        return bk.checkUrls([url], timeout=timeout, **kwArgs)[url]
+
+    srv, base = serve(timeout)
+    try:
+        status, finalUrl, error, _ = res = checkOne(srv, base, '/ok')
+        check("ok: 200 to a HEAD", status==200 and finalUrl is None and error is None and srv.requests==[('HEAD', '/ok')], res)
+        check("ok: alive", bk.isAlive(res))
+
+        del srv.requests[:]
+        status, finalUrl, error, _ = res = checkOne(srv, base, '/noHead')
+        check("HEAD refused (405): GET instead", status==200 and error is None and srv.requests==[('HEAD', '/noHead'), ('GET', '/noHead')], (res, srv.requests))
+
+        del srv.requests[:]
+        status, finalUrl, error, _ = res = checkOne(srv, base, '/missing')
+        check("missing: 404 after a HEAD and a GET", status==404 and not bk.isAlive(res) and [m for m, p in srv.requests]==['HEAD', 'GET'], (res, srv.requests))
+
+        status, finalUrl, error, _ = res = checkOne(srv, base, '/redirect/5')
+        check("5 redirects: followed", status==200 and finalUrl==base+'/redirect/0' and error is None, res)
+
+        status, finalUrl, error, _ = res = checkOne(srv, base, '/redirect/6')
+        check("6 redirects: too many", status==301 and error=="too many redirects" and not bk.isAlive(res), res)
+
+        status, finalUrl, error, _ = res = checkOne(srv, base, '/loop')
+        check("redirect loop: too many redirects", status==302 and error=="too many redirects" and not bk.isAlive(res), res)
+
+        start = time.perf_counter()
+        status, finalUrl, error, _ = res = checkOne(srv, base, '/slow')
+        spent = time.perf_counter() - start                                       # (the HEAD and the GET each time out)
+        check("slow: timeout", status is None and error=="timeout" and spent<timeout*3, (res, f"{spent:.1f}s"))
+
+        status, finalUrl, error, _ = res = checkOne(srv, base, '/big')
+        check("big body: 200", status==200 and error is None, res)
+
+        status, finalUrl, error, _ = res = bk.checkUrls([f"http://127.0.0.1:{freePort()}/"], timeout=timeout).popitem()[1]
+        check("refused connection: an error", status is None and error and not bk.isAlive(res), res)
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    srv, base = serve(timeout)                                                           # pooling: 40 urls, kept alive connections, 2 at a time
+    try:
+        urls = [f"{base}/ok?n={i}" for i in range(40)]
+        res  = bk.checkUrls(urls, perHost=2, timeout=timeout)
+        check("pooled: all 40 ok", len(res)==40 and all(r[0]==200 for r in res.values()))
+        check("pooled: connections reused (<= perHost)", srv.connections<=2, f"{srv.connections} connections")
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    srv, base = serve(timeout)                                                           # the host limit: requests in flight at once
+    try:
+        res = bk.checkUrls([f"{base}/busy?n={i}" for i in range(12)], perHost=3, timeout=timeout)
+        check("perHost: at most 3 in flight", all(r[0]==200 for r in res.values()) and srv.maxInFlight<=3, f"{srv.maxInFlight} in flight")
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    srv, base = serve(timeout)                                                           # an idle connection closed by the server: a new one
+    try:
+        res = bk.checkUrls([f"{base}/drop?n={i}" for i in range(5)], perHost=1, timeout=timeout)
+        check("closed idle connection: reconnected", all(r[0]==200 and r[2] is None for r in res.values()), res)
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    srv, base = serve(timeout)                                                           # the cache: urls checked within the ttl aren't checked again
+    with tempfile.TemporaryDirectory() as tmpDir:
+        try:
+            cache = bk.CheckCache(os.path.join(tmpDir, 'check.sqlite'))
+            urls  = [base+'/ok', base+'/missing']
+            first = bk.checkUrls(urls, cache=cache, timeout=timeout)
+            made  = len(srv.requests)
+            again = bk.checkUrls(urls, cache=cache, timeout=timeout)
+            check("cache: not checked again", len(srv.requests)==made and again==first, f"{len(srv.requests)-made} requests")
+            cache.close()
+        finally:
+            srv.shutdown()
+            srv.server_close()
+
+    return results
+
+# ------------------------------------------------------------------------- results written into url files
+
+fileDate  = 1000000000                                                            # the bookmark's date, as mtime of the url files
+urlFiles  = {                                                                     # url file -> its text, {url} for the url
+    'a.url':      "[InternetShortcut]\nURL={url}\nTITLE=a title\nDATE_ADDED=2001-09-09T01:46:40\n\n[Extra]\nKEY=kept\n",
+    'crlf.url':   "[InternetShortcut]\r\nURL={url}\r\nICON=data:image/png;base64,AAAA\r\n",
+    'a.desktop':  "[Desktop Entry]\nEncoding=UTF-8\nName=a title\nType=Link\nURL={url}\nIcon=text-html\n",
+    'a.webloc':   ('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">\n'
+                   '<plist version="1.0">\n<dict>\n    <key>URL</key> <string>{url}</string>\n    <key>DATE_ADDED</key> <string>2001-09-09T01:46:40</string>\n</dict>\n</plist>\n'),
+    'a.html':     ('<html><head><meta http-equiv="refresh" content="0; url={url}" />\n    <title>a title</title>\n'
+                   '    <meta name="description" content="kept" />\n</head><body></body></html>\n'),
+}
+linkLineRe = re.compile(r'^[ \t]*(LINK_|X-Link-|<key>LINK_|<meta name="link-).*(\r?\n)?', re.M)  # the lines write_check_meta adds
+
+
+def makeUrlFiles(fldr, url):
+    """the url files of urlFiles (and a binary .webloc) in fldr for url, dated fileDate: {path: bytes written}
+    """
+    written = {}
+    for name, text in urlFiles.items():
+        written[os.path.join(fldr, name)] = text.format(url=url).encode('utf-8')
+    written[os.path.join(fldr, 'bin.webloc')] = plistlib.dumps({'URL': url, 'TITLE': 'a title'}, fmt=plistlib.FMT_BINARY)
+    for path, data in written.items():
+        with open(path, 'wb') as f: f.write(data)
+        os.utime(path, (fileDate, fileDate))
+    return written
+
+
+def linkMeta(path):
+    """the check results in a url file, as {STATUS: .., CHECKED: .., FINAL_URL: ..}
+    """
+    with open(path, 'rb') as f: data = f.read()
+    if data.startswith(b'bplist'):
+        return {k[5:]:v for k,v in plistlib.loads(data).items() if k.startswith('LINK_')}
+    text = data.decode('utf-8')
+    if path.endswith('.html'):
+        return {k.upper().replace('-', '_'):v for k,v in re.findall(r'<meta name="link-([a-z-]+)" content="([^"]*)"', text)}
+    if path.endswith('.webloc'):
+        return {k:v for k,v in re.findall(r'<key>LINK_([A-Z_]+)</key>\s*<string>([^<]*)</string>', text)}
+    return {k.split('-', 2)[-1].upper().replace('-', '_') if k.startswith('X-Link-') else k[5:]:v
+            for k,v in re.findall(r'^(LINK_[A-Z_]+|X-Link-[A-Za-z-]+)=(.*?)\r?$', text, re.M)}
+
+
+def withoutMeta(path):
+    """the url file as it was before the check results were written into it
+    """
+    with open(path, 'rb') as f: data = f.read()
+    if data.startswith(b'bplist'): return {k:v for k,v in plistlib.loads(data).items() if not k.startswith('LINK_')}
+    return linkLineRe.sub('', data.decode('utf-8')).encode('utf-8')
+
+
+def runMetaChecks(timeout=1.0, verbose=False):
+    """run the checks of writing results into url files, the list of (name, passed, detail)
+    """
+
+    results = []
+    check   = checker(results, verbose)
+    url     = 'http://example.com/a?b=1&c=2'
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        written = makeUrlFiles(tmpDir, url)
+        for path, data in written.items():
+            name = os.path.basename(path)
+            done = ouf.write_check_meta(path, (301, 'http://example.com/final', None, fileDate+100))
+            meta = linkMeta(path)
+            check(f"{name}: results written", done and meta.get('STATUS')=='301' and meta.get('FINAL_URL')=='http://example.com/final' and meta.get('CHECKED'), meta)
+            check(f"{name}: mtime kept", os.stat(path).st_mtime==fileDate, os.stat(path).st_mtime)
+            before = plistlib.loads(data) if data.startswith(b'bplist') else data
+            check(f"{name}: the rest untouched", withoutMeta(path)==before, withoutMeta(path))
+            check(f"{name}: url still read", ouf.get_url_file(path)==url, ouf.get_url_file(path))
+
+            ouf.write_check_meta(path, (404, None, None, fileDate+200))             # a later check replaces the results
+            meta = linkMeta(path)
+            check(f"{name}: results replaced", meta.get('STATUS')=='404' and 'FINAL_URL' not in meta and withoutMeta(path)==before, meta)
+
+        noPlace = os.path.join(tmpDir, 'nohead.html')                             # nowhere to put them: left alone
+        with open(noPlace, 'w') as f: f.write('<html><body>a page</body></html>\n')
+        check("no <head>: not written", ouf.write_check_meta(noPlace, (200, None, None, fileDate))==False and linkMeta(noPlace)=={})
+
+    srv, base = serve(timeout)                                                    # the check sub-command, on a tree of url files
+    with tempfile.TemporaryDirectory() as tmpDir:
+        try:
+            tree = os.path.join(tmpDir, 'tree')
+            os.makedirs(os.path.join(tree, 'sub'))
+            alive, dead = makeUrlFiles(tree, base+'/noHead'), makeUrlFiles(os.path.join(tree, 'sub'), base+'/missing')
+            proc = subprocess.run([sys.executable, str(Path(__file__).parent/'openUrlFile.py'), 'check', '--checkDb', os.path.join(tmpDir, 'check.sqlite'),
+                                   '--timeout', str(timeout), tree], capture_output=True, text=True)
+            lines = [ln.split('\t') for ln in proc.stdout.splitlines()]
+            check("check: a line per url file", proc.returncode in (0, 1) and len(lines)==len(alive)+len(dead), proc.stdout+proc.stderr)
+            check("check: statuses", all(st==('200' if os.path.dirname(fl)==tree else '404') for st, url, info, fl in lines), lines)
+            for path, data in {**alive, **dead}.items():
+                name   = os.path.relpath(path, tree)
+                before = plistlib.loads(data) if data.startswith(b'bplist') else data
+                status = linkMeta(path).get('STATUS')
+                check(f"check {name}: results written, mtime and the rest kept",
+                      status==('200' if path in alive else '404') and os.stat(path).st_mtime==fileDate and withoutMeta(path)==before, status)
+        finally:
+            srv.shutdown()
+            srv.server_close()
+
+    return results
+
+# ------------------------------------------------------------------------------ main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog='bkmksCheckTest.py',
+        description='check bkmksCheck.py (HEAD/GET fallback, redirects, timeouts, pooling, cache) and the writing of the results into url files')
+
+    parser.add_argument('-t',  '--timeout',  type=float, default=1.0, help='timeout given to the checks in seconds, the slow page takes 4 times that (default 1)')
+    parser.add_argument('-v',  '--verbose',  action='store_true', help='also show the results of the checks that pass')
+
+    args = parser.parse_args()
+
+    results = runChecks(args.timeout, args.verbose) + runMetaChecks(args.timeout, args.verbose)
+    failed  = [name for name, passed, detail in results if not passed]
+    print(f"{len(results)-len(failed)} of {len(results)} passed", file=sys.stderr)
+    sys.exit(1 if failed else 0)
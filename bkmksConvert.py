@@ -8,16 +8,48 @@ import sys
 import re
 import os
 import argparse
-import subprocess
 import json
 import sqlite3
+import hashlib
+import base64
+import tempfile
 import unicodedata as ud
 import datetime as dt
-
+import time
+import tarfile
+import zipfile
+import warnings
+import traceback
+import cProfile
+import pstats
+import threading
+
+from functools import lru_cache
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from glob import glob
-from io import StringIO
+from io import StringIO, BytesIO
+from threading import BoundedSemaphore
 from lxml import etree
 from pathlib import Path
+from bkmksIndex import BookmarkIndex, defaultIndexFile
+from bkmksCache import ParseCache, defaultParseCacheFile
+from openUrlFile import get_url_fields, indexedExts
+from html import escape
+from urllib.parse import urlsplit, urlunsplit, unquote_to_bytes, quote
+
+try:
+    import ijson                                                                   # optional: fast incremental json parsing (see readJsonEvents)
+except ImportError:
+    ijson = None
+try:
+    import zstandard                                                               # optional: writing .tar.zst archives (see ArchiveFileWriter)
+except ImportError:
+    zstandard = None
+try:
+    import lz4.block                                                               # optional: fast decompression of .jsonlz4 backups (see readMozLz4)
+except ImportError:
+    lz4 = None
 
 # ------------------------------------------------------------------------- utility functions
 
@@ -27,15 +59,21 @@ def cleanupTags(f, sio):
     """
 
     with open(f, 'r') as infile:
-        for ln in infile:
-            lnClean = re.sub(r'(\s+)<DT>', r'\1', ln);
-            if lnClean.startswith('<DD>'): lnClean+='</DD>'           # close unclosed <DD>s
-            lnClean = lnClean.replace('<p>','<p></p>')                # close unclosed <p>s
-            sio.write(lnClean)
+        for ln in infile: sio.write(cleanupLine(ln))
     sio.seek(0)
     return sio
 
 
+def cleanupLine(ln):
+    """clean up a single line of bookmarks HTML, as cleanupTags does for the whole file
+    """
+
+    lnClean = re.sub(r'(\s+)<DT>', r'\1', ln);
+    if lnClean.startswith('<DD>'): lnClean+='</DD>'                   # close unclosed <DD>s
+    lnClean = lnClean.replace('<p>','<p></p>')                        # close unclosed <p>s
+    return lnClean
+
+
 def cleanName(txt):
     """derive a reasonable file name, free of weird characters, from the url name or title
     """
@@ -49,20 +87,303 @@ def cleanName(txt):
 
 
 def unixEpochToIsoDateTime(unixEpochSeconds):
+    """local iso date time of a unix epoch. Formatted with integer arithmetic from the (cached) utc offset and date of its day,
+       rather than making a datetime per call, except on days the utc offset changes (see utcOffsetOfDay)
+    """
+
+    secs = int(unixEpochSeconds//1)
+    if secs>=0 and unixEpochSeconds-secs < 0.9999995:                              # (else fromtimestamp would round it up to the next second)
+        offset = utcOffsetOfDay(secs//86400)
+        if offset is not None:
+            day, rem = divmod(secs+offset, 86400)
+            return f"{isoDate(day)}T{rem//3600:02d}:{rem//60%60:02d}:{rem%60:02d}"
     return dt.datetime.fromtimestamp(unixEpochSeconds).strftime('%Y-%m-%dT%H:%M:%S')
 
 
+@lru_cache(maxsize=1<<16)
+def utcOffsetOfDay(unixDay):
+    """the local utc offset (in seconds) throughout a utc day, None if it changes during the day (daylight saving)
+    """
+
+    offset = time.localtime(unixDay*86400).tm_gmtoff
+    return offset if time.localtime(unixDay*86400+86399).tm_gmtoff==offset else None
+
+
+@lru_cache(maxsize=1<<16)
+def isoDate(localDay):
+    return (dt.date(1970, 1, 1) + dt.timedelta(days=localDay)).isoformat()
+
+
 def closeUrlFile(fileDscrptr, urlDate=None):
     """close file and set its modified date to the url's add_date
     """
 
     urlFileName = fileDscrptr.name
-    if fileDscrptr!=sys.stdout:
+    if isinstance(fileDscrptr, UrlFileBuffer):                                    # rendered in memory, hand it over to the writer pool
+        fileWriter.writeFile(urlFileName, fileDscrptr.getvalue(), urlDate)
+    elif fileDscrptr!=sys.stdout:
         fileDscrptr.close()
-        if urlDate:
-            if args.verbose: print("Closed", urlFileName, urlDate, unixEpochToIsoDateTime(urlDate)) # check date conversioning
-            stat = os.stat(urlFileName)
-            os.utime(urlFileName, times=(stat.st_atime, urlDate))     # utime must have two ints or floats (unix timestamps): (atime, mtime)
+        if stats: stats.count('bytes', os.path.getsize(urlFileName))
+        if urlDate: setFileDate(urlFileName, urlDate)
+
+
+def setFileDate(urlFileName, urlDate):
+    if args.verbose: print("Closed", urlFileName, urlDate, unixEpochToIsoDateTime(urlDate)) # check date conversioning
+    stat = os.stat(urlFileName)
+    os.utime(urlFileName, times=(stat.st_atime, urlDate))         # utime must have two ints or floats (unix timestamps): (atime, mtime)
+
+
+def writeUrlFile(urlFileName, text, urlDate=None):
+    """write an already rendered bookmark file and set its modified date, as makeBookmarkFile + closeUrlFile do
+    """
+
+    outFile = open(urlFileName, 'w', encoding='utf-8')
+    outFile.write(text)
+    closeUrlFile(outFile, urlDate)
+
+# ------------------------------------------------------------------------- parallel writing of files
+
+class UrlFileBuffer(StringIO):
+    """in-memory stand-in for a bookmark file, closeUrlFile passes its contents on to the fileWriter
+    """
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+
+class ParallelFileWriter:
+    """write bookmark files on a pool of threads, so that slow (network, synced) filesystems don't serialise the traversal.
+       Folders are created synchronously, so they always exist before any of their files are written.
+       Each file path is always written by the same thread, in submission order, so duplicate names
+       overwrite each other just as in a serial run and the resulting tree is identical.
+    """
+
+    def __init__(self, jobs, backlog=64):
+        self.pools   = [ThreadPoolExecutor(max_workers=1) for _ in range(jobs)]
+        self.pending = BoundedSemaphore(jobs*backlog)                             # bound the number of rendered files held in memory
+        self.errors  = []
+
+    def makeDir(self, path):
+        os.makedirs(path, exist_ok=True)
+
+    def writeFile(self, urlFileName, text, urlDate=None):
+        self.pending.acquire()
+        pool = self.pools[hash(str(urlFileName)) % len(self.pools)]
+        ftr  = pool.submit(writeUrlFile, urlFileName, text, urlDate)
+        ftr.add_done_callback(self.done)
+
+    def done(self, ftr):
+        self.pending.release()
+        if ftr.exception():
+            self.errors.append(ftr.exception())
+            if stats: stats.count('failed')
+
+    def close(self):
+        for pool in self.pools: pool.shutdown(wait=True)
+        for err in self.errors: print("FAILED writing", err, file=sys.stderr)
+        if self.errors: raise self.errors[0]
+
+
+
+class IncrementalFileWriter:
+    """only (re)write bookmark files whose contents or date changed since the previous run into the same write folder.
+       A manifest of (relative path -> digest of date and contents) is kept in the root of the write folder,
+       files that are unchanged are left alone, so their mtimes (and any syncing clients) are undisturbed.
+       Delete the manifest to force a full rewrite.
+    """
+
+    manifestName = '.bkmksManifest.json'
+    multipleKey  = '/multiple'                                                     # (no relative path) manifest entry listing the names seen more than once
+
+    def __init__(self, rootFldr, inner=None, prune=False):
+        self.root     = Path(rootFldr)
+        self.inner    = inner                                                      # e.g. a ParallelFileWriter, otherwise write directly
+        self.prune    = prune
+        self.manifest = {}
+        self.multiple = set()                                                      # names seen more than once in the previous run
+        self.repeated = set()                                                      # and in this one
+        self.written  = {}                                                         # relative path -> digest, for this run
+        self.pending  = {}                                                         # relative path -> last file of a name seen more than once, and the digest on disk
+        self.counts   = {'written':0, 'unchanged':0, 'pruned':0}
+        manifestFile  = self.root / self.manifestName
+        if manifestFile.exists():
+            with open(manifestFile, 'r') as mf: self.manifest = json.load(mf)
+            self.multiple = set(self.manifest.pop(self.multipleKey, ()))
+
+    def makeDir(self, path):
+        if self.inner: self.inner.makeDir(path)
+        else:          os.makedirs(path, exist_ok=True)
+
+    def writeFile(self, urlFileName, text, urlDate=None):
+        key    = Path(urlFileName).relative_to(self.root).as_posix()
+        digest = hashlib.sha1(f"{urlDate}\n{text}".encode('utf-8')).hexdigest()
+        if key in self.multiple or key in self.written:                           # a name seen more than once: only its last file is compared, at close
+            onDisk = self.pending[key][3] if key in self.pending else self.written.get(key, self.manifest.get(key))
+            self.pending[key] = (urlFileName, text, urlDate, onDisk)
+            if key in self.written: self.repeated.add(key)
+        else:
+            self.writeChanged(urlFileName, text, urlDate, self.manifest.get(key)!=digest)
+        self.written[key] = digest
+
+    def writeChanged(self, urlFileName, text, urlDate, changed):
+        if not changed:
+            self.counts['unchanged'] += 1
+        else:
+            self.counts['written'] += 1
+            if self.inner: self.inner.writeFile(urlFileName, text, urlDate)
+            else:          writeUrlFile(urlFileName, text, urlDate)
+
+    def close(self):
+        for key, (urlFileName, text, urlDate, onDisk) in self.pending.items():
+            self.writeChanged(urlFileName, text, urlDate, self.written[key]!=onDisk)
+        if self.inner: self.inner.close()
+        if self.prune:                                                             # delete files of bookmarks that are no longer in the input
+            for key in self.manifest.keys() - self.written.keys():
+                urlFile = self.root / key
+                if urlFile.exists(): os.remove(urlFile)
+                self.counts['pruned'] += 1
+                for fldr in urlFile.parents:                                       # and any folders that are now empty
+                    if fldr==self.root or not fldr.exists() or any(fldr.iterdir()): break
+                    os.rmdir(fldr)
+        else:
+            self.written = {**self.manifest, **self.written}                      # keep deleted bookmarks so a later --prune still finds them
+        if self.repeated: self.written[self.multipleKey] = sorted(self.repeated)
+        manifestFile = self.root / self.manifestName
+        with open(str(manifestFile)+'.tmp', 'w') as mf: json.dump(self.written, mf)
+        os.replace(str(manifestFile)+'.tmp', manifestFile)
+        print("incremental:", ", ".join(f"{k}={v}" for k,v in self.counts.items()), file=sys.stderr)
+
+
+class ArchiveFileWriter:
+    """write the bookmark files and folders as members of a zip or (compressed) tar archive, instead of into the filesystem.
+       Members are streamed into the archive as they are made, each file gets the bookmark's date as mtime, as closeUrlFile
+       gives files. Like a serial run, a later file of the same name wins (when the archive is extracted).
+    """
+
+    tarModes = {'.tar':'w|', '.tar.gz':'w|gz', '.tgz':'w|gz', '.tar.bz2':'w|bz2', '.tar.xz':'w|xz', '.tar.zst':'w|', '.tzst':'w|'}
+
+    def __init__(self, archiveFile):
+        name        = str(archiveFile).lower()
+        tarSuffix   = next((sfx for sfx in self.tarModes if name.endswith(sfx)), None)
+        self.zip    = self.tar = self.zstd = None
+        self.dirs   = set()
+        self.counts = {'files':0, 'folders':0}
+        if name.endswith('.zip'):
+            self.zip  = zipfile.ZipFile(archiveFile, 'w', compression=zipfile.ZIP_DEFLATED)
+        elif tarSuffix in ('.tar.zst', '.tzst'):
+            if zstandard is None: raise ValueError("writing a .tar.zst archive needs the zstandard package (pip install zstandard)")
+            self.zstd = zstandard.ZstdCompressor().stream_writer(open(archiveFile, 'wb'))
+            self.tar  = tarfile.open(fileobj=self.zstd, mode='w|')
+        elif tarSuffix:
+            self.tar  = tarfile.open(archiveFile, mode=self.tarModes[tarSuffix])
+        else:
+            raise ValueError(f"unsupported archive type {archiveFile}, use .zip, .tar, .tar.gz, .tar.bz2, .tar.xz or .tar.zst")
+
+    def memberName(self, path):
+        return Path(path).as_posix().lstrip('/').removeprefix('./')
+
+    def makeDir(self, path):
+        name = self.memberName(path)
+        if name in self.dirs or name in ('', '.'): return
+        self.dirs.add(name)
+        self.counts['folders'] += 1
+        if self.zip:
+            zi = zipfile.ZipInfo(name+'/', date_time=time.localtime()[:6])
+            zi.external_attr = (0o40755 << 16) | 0x10                             # unix drwxr-xr-x, and the ms-dos directory flag
+            self.zip.writestr(zi, b'')
+        else:
+            ti = tarfile.TarInfo(name)
+            ti.type, ti.mode, ti.mtime = tarfile.DIRTYPE, 0o755, time.time()
+            self.tar.addfile(ti)
+
+    def writeFile(self, urlFileName, text, urlDate=None):
+        data  = text.encode('utf-8') if isinstance(text, str) else text
+        mtime = urlDate if urlDate else time.time()
+        self.counts['files'] += 1
+        if stats: stats.count('bytes', len(data))                                 # (uncompressed, as the files would take)
+        if self.zip:
+            zi = zipfile.ZipInfo(self.memberName(urlFileName), date_time=max(time.localtime(mtime)[:6], (1980,1,1,0,0,0)))  # zip dates start in 1980
+            zi.compress_type, zi.external_attr = zipfile.ZIP_DEFLATED, 0o644 << 16
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')                                   # "Duplicate name", see above
+                self.zip.writestr(zi, data)
+        else:
+            ti = tarfile.TarInfo(self.memberName(urlFileName))
+            ti.size, ti.mode, ti.mtime = len(data), 0o644, mtime
+            self.tar.addfile(ti, BytesIO(data))
+
+    def close(self):
+        if self.zip:  self.zip.close()
+        if self.tar:  self.tar.close()
+        if self.zstd: self.zstd.close()                                           # (also closes the archive file)
+        print("archive:", ", ".join(f"{k}={v}" for k,v in self.counts.items()), file=sys.stderr)
+
+
+class IconStore:
+    """content-addressed store of favicons inside the write folder: each data: uri icon is decoded once and saved
+       as icons/<sha256 of the image>.<ext>, bookmark files then refer to it by that (write folder relative) path.
+       An icon already in the store, from this run or an earlier one, is never written again.
+    """
+
+    fldrName = 'icons'
+    mimeExts = {'image/png':'.png', 'image/x-icon':'.ico', 'image/vnd.microsoft.icon':'.ico', 'image/gif':'.gif',
+                'image/jpeg':'.jpg', 'image/svg+xml':'.svg', 'image/webp':'.webp', 'image/bmp':'.bmp'}
+
+    def __init__(self, rootFldr, archive=None):
+        self.fldr    = Path(rootFldr) / self.fldrName
+        self.refs    = {}                                                         # data uri -> reference, so each icon is decoded only once
+        self.counts  = {'decoded':0, 'stored':0, 'refs':0}
+        self.archive = archive                                                    # an ArchiveFileWriter to store the icons in, instead of the filesystem
+        self.stored  = set()
+        if archive: archive.makeDir(self.fldr)
+        else:       os.makedirs(self.fldr, exist_ok=True)
+
+    def ref(self, icon):
+        """the store reference for a data: uri icon (stored first if new), anything else is returned unchanged
+        """
+
+        self.counts['refs'] += 1
+        if icon in self.refs: return self.refs[icon]
+        iconRef = icon
+        if icon.startswith('data:') and ',' in icon:
+            header, _, payload = icon[5:].partition(',')
+            mime, *params      = header.split(';')
+            try:
+                data = base64.b64decode(payload, validate=True) if 'base64' in params else unquote_to_bytes(payload)
+            except ValueError:
+                data = None                                                       # garbled icon: left inline
+            if data:
+                iconName = hashlib.sha256(data).hexdigest() + self.mimeExts.get(mime.strip().lower(), '.bin')
+                iconFile = self.fldr / iconName
+                self.counts['decoded'] += 1
+                if self.archive:
+                    if iconName not in self.stored:
+                        self.archive.writeFile(iconFile, data)                    # (counts its bytes)
+                        self.stored.add(iconName)
+                        self.counts['stored'] += 1
+                elif not iconFile.exists():
+                    with open(str(iconFile)+'.tmp', 'wb') as f: f.write(data)
+                    os.replace(str(iconFile)+'.tmp', iconFile)
+                    self.counts['stored'] += 1
+                    if stats: stats.count('bytes', len(data))
+                iconRef = f"{self.fldrName}/{iconName}"
+        self.refs[icon] = iconRef
+        return iconRef
+
+    def close(self):
+        print("icons:", ", ".join(f"{k}={v}" for k,v in self.counts.items()), file=sys.stderr)
+
+
+fileWriter    = None        # GLOBAL VAR: a ParallelFileWriter/IncrementalFileWriter/ArchiveFileWriter when writing with --jobs/--incremental/--archive, otherwise files are written directly
+convertCounts = {'bookmarks':0, 'folders':0}                                       # GLOBAL VAR: bookmarks and folders made by the current conversion
+iconStore     = None        # GLOBAL VAR: an IconStore when writing with --icons, otherwise icons are written inline into each file
+bookmarkStore = None        # GLOBAL VAR: a BookmarkStore collecting the bookmarks of several inputs when merging (--merge), nothing is written meanwhile
+stats         = None        # GLOBAL VAR: a ConvertStats when run with --stats, counting and timing the stages of the conversion
+batchProfiles = []          # GLOBAL VAR: cProfile dumps of the files a batch's workers converted with --profile, added to the main process's
+bookmarkIndex = None        # GLOBAL VAR: a BookmarkIndex (bkmksIndex.py) when indexing the written files for openUrlFile.py search (--index)
+exporter      = None        # GLOBAL VAR: a BookmarkExporter when exporting into one file (--export), no folders or bookmark files are made
+parseCache    = None        # GLOBAL VAR: a ParseCache (bkmksCache.py) when parsed inputs are cached (--parseCache), opened by the first traverseFile
 
 # ------------------------------------------------------------------------- functions to create files and folders
 
@@ -71,32 +392,40 @@ def makeBookmarkFile(depth, name, href, outFmt, add_date=None, last_visited=None
        date_scaling should be either 1 or 1000000 depending on whether the epoch integer date time is in seconds or in microseconds
     """
 
-    pageCleanName = cleanName(name)
+    convertCounts['bookmarks'] += 1
     if args.verbose: print("+ ", name)                                                     # print("*"*(depth+1), name)
 
-    if fldrPath is None:
-        outFile = sys.stdout
-    else:
-        urlFileName   = fldrPath / Path(pageCleanName if pageCleanName!="" else "notitle").with_suffix(outFmt)
-        outFile = open(urlFileName, 'w', encoding='utf-8')                                 # file is not closed in this function as it may need more writing to (in the html parsing case)
-
+    if bookmarkStore is not None:                                                          # merging: just collect the bookmark
+        bookmarkStore.add(fldrPath, name, href, add_date, last_visited, last_modified, icon_uri, icon, last_charset, date_scaling)
+        return sys.stdout, None                                                            # callers (and closeUrlFile) leave sys.stdout alone
 
     if add_date: addDate = int(add_date)/date_scaling
     else:
         print("WARNING: No Date for", name, file=sys.stderr)
+        if stats: stats.count('noDate')
         addDate = 0
+    lastModified = int(last_modified)/date_scaling if last_modified else None
+    lastVisited  = int(last_visited)/date_scaling  if last_visited  else None
+
+    if exporter is not None:                                                               # exporting into one file: hand the bookmark over
+        exporter.bookmark(fldrPath, name, href, addDate, lastModified, lastVisited, icon_uri, icon, last_charset)
+        return sys.stdout, None
+
+    if icon and iconStore: icon = iconStore.ref(icon)                                      # refer to the stored icon by hash instead of inline
+
+    if fldrPath is None:
+        outFile = sys.stdout
+    else:
+        pageCleanName = cleanName(name)
+        urlFileName   = fldrPath / Path(pageCleanName if pageCleanName!="" else "notitle").with_suffix(outFmt)
+        if bookmarkIndex and outFmt!='.org':                                               # (openUrlFile.py doesn't read .org files)
+            bookmarkIndex.add(urlFileName, name, href, added=unixEpochToIsoDateTime(addDate), visited=lastVisited and unixEpochToIsoDateTime(lastVisited))
+        if fileWriter: outFile = UrlFileBuffer(urlFileName)                                # rendered in memory, written out by the fileWriter on closeUrlFile
+        else:          outFile = open(urlFileName, 'w', encoding='utf-8')                  # file is not closed in this function as it may need more writing to (in the html parsing case)
 
 
     if outFmt=='.org' or outFile==sys.stdout:                                              # format as org-mode named list entries
-        print(                  f" - TITLE ::{name}",                                                            file=outFile)
-        print(                  f" - URL ::{href}",                                                              file=outFile)
-        print(                  f" - DATE_ADDED ::{unixEpochToIsoDateTime(addDate)}",                            file=outFile)
-        if last_modified: print(f" - DATE_MODIFIED ::{unixEpochToIsoDateTime(int(last_modified)/date_scaling)}", file=outFile)
-        if last_visited:  print(f" - DATE_VISITED ::{unixEpochToIsoDateTime(int(last_visited)/date_scaling)}",   file=outFile)
-        if icon_uri:      print(f" - ICON_URI ::{icon_uri}",                                                     file=outFile)
-        if icon:          print(f" - ICON ::{icon}",                                                             file=outFile)
-        if last_charset:  print(f" - LAST_CHARSET ::{last_charset}",                                             file=outFile)
-        print(                   "",                                                                             file=outFile) # add terminating newline
+        outFile.write(orgEntry(name, href, addDate, lastModified, lastVisited, icon_uri, icon, last_charset))
 
     elif outFmt=='.url':                                                                   # format as window shortcut .url
         print(                   "[InternetShortcut]", file=outFile)
@@ -137,63 +466,180 @@ def makeBookmarkFolderDir(depth, text, fldrPath=None):
     """
 
     clnName = cleanName(text)
+    convertCounts['folders'] += 1
+    if bookmarkStore is not None: return Path(fldrPath) / clnName                         # merging: only the path is needed
+    if exporter is not None:
+        exporter.folder(depth, clnName)
+        return Path(fldrPath) / clnName
     print("*"*depth, clnName)
 
     if fldrPath is None:
         subFldrPath = None
     else:
-        subFldrPath = fldrPath / clnName
-        os.makedirs(subFldrPath, exist_ok=True)
+        subFldrPath = Path(fldrPath) / clnName
+        if fileWriter: fileWriter.makeDir(subFldrPath)
+        else:          os.makedirs(subFldrPath, exist_ok=True)
 
     return subFldrPath
 
+# ------------------------------------------------------------------------- export into one file (org, markdown, jsonl)
+
+def orgEntry(name, href, addDate, lastModified=None, lastVisited=None, icon_uri=None, icon=None, last_charset=None):
+    """a bookmark as an org-mode named list, rendered into one string, dates in (unix epoch) seconds
+    """
+
+    entry = [f" - TITLE ::{name}\n"]
+    if href is not None:         entry.append(f" - URL ::{href}\n")                              # (a bookmark without a place has no url)
+    entry.append(f" - DATE_ADDED ::{unixEpochToIsoDateTime(addDate)}\n")
+    if lastModified is not None: entry.append(f" - DATE_MODIFIED ::{unixEpochToIsoDateTime(lastModified)}\n")
+    if lastVisited  is not None: entry.append(f" - DATE_VISITED ::{unixEpochToIsoDateTime(lastVisited)}\n")
+    if icon_uri:                 entry.append(f" - ICON_URI ::{icon_uri}\n")
+    if icon:                     entry.append(f" - ICON ::{icon}\n")
+    if last_charset:             entry.append(f" - LAST_CHARSET ::{last_charset}\n")
+    entry.append("\n")                                                                        # terminating newline
+    return "".join(entry)
+
+
+mdHrefRe = re.compile(r'[<>\s]')                                                  # would end the <..> of a markdown link, percent-encoded
+
+def mdEntry(name, href, addDate, lastModified=None, lastVisited=None, icon_uri=None, icon=None, last_charset=None):
+    """a bookmark as a markdown list item, with its dates as a nested list
+    """
+
+    title = (name or href or '').replace('\\', '\\\\').replace('[', '\\[').replace(']', '\\]')
+    if href is None: entry = [f"- {title}\n"]                                     # nothing to link to
+    else:            entry = [f"- [{title}](<{mdHrefRe.sub(lambda m: quote(m.group()), href)}>)\n"]
+    entry.append(f"  - added: {unixEpochToIsoDateTime(addDate)}\n")
+    if lastModified is not None: entry.append(f"  - modified: {unixEpochToIsoDateTime(lastModified)}\n")
+    if lastVisited  is not None: entry.append(f"  - visited: {unixEpochToIsoDateTime(lastVisited)}\n")
+    return "".join(entry)
+
+
+class BookmarkExporter:
+    """write all the folders and bookmarks of a traversal into one file, as org-mode (same as the stdout output),
+       markdown (.md) or one json object per bookmark (.jsonl). Entries are rendered into strings and written
+       through a large buffer, instead of a print per line.
+    """
+
+    formats = ('.org', '.md', '.jsonl')
+
+    def __init__(self, exportFile, bufSize=1<<20):
+        self.fmt = Path(exportFile).suffix if exportFile!='-' else '.org'
+        if self.fmt not in self.formats: raise ValueError(f"unsupported export format {self.fmt}, use one of {', '.join(self.formats)}")
+        self.outFile = sys.stdout if exportFile=='-' else open(exportFile, 'w', encoding='utf-8', buffering=bufSize)
+
+    def folder(self, depth, name):
+        if   self.fmt=='.org': self.outFile.write(f"{'*'*depth} {name}\n")
+        elif self.fmt=='.md' and name: self.outFile.write(f"\n{'#'*min(max(depth, 1), 6)} {name}\n\n")
+
+    def bookmark(self, fldrPath, name, href, addDate, lastModified=None, lastVisited=None, icon_uri=None, icon=None, last_charset=None):
+        if   self.fmt=='.org': self.outFile.write(orgEntry(name, href, addDate, lastModified, lastVisited, icon_uri, icon, last_charset))
+        elif self.fmt=='.md':  self.outFile.write(mdEntry(name, href, addDate, lastModified, lastVisited))
+        else:
+            entry = {'folder':Path(fldrPath).as_posix() if fldrPath else '.', 'title':name, 'url':href, 'dateAdded':unixEpochToIsoDateTime(addDate)}
+            if lastModified is not None: entry['dateModified'] = unixEpochToIsoDateTime(lastModified)
+            if lastVisited  is not None: entry['dateVisited']  = unixEpochToIsoDateTime(lastVisited)
+            if icon_uri:                 entry['iconUri']      = icon_uri
+            if icon:                     entry['icon']         = icon
+            if last_charset:             entry['charset']      = last_charset
+            self.outFile.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def close(self):
+        if self.outFile is not sys.stdout: self.outFile.close()
+        else:                              self.outFile.flush()
+
 # ------------------------------------------------------------------------- convert sqlite
 
-def readSqliteBookmarks(dbFile):
-    """convert hierarchy implict in table back into explicit one
+def connectPlacesDb(dbFile, live=False):
+    """open places.sqlite read-only, so that a running browser neither blocks nor is blocked by the conversion.
+       With live, take a consistent snapshot of the database (including its WAL) with the backup api,
+       or, if the browser holds an exclusive lock, read the database file as immutable (ignoring its WAL).
+       Text that isn't valid utf-8 is decoded with replacement characters instead of failing the query.
     """
 
-    conn = sqlite3.connect(dbFile)
+    uri = Path(dbFile).resolve().as_uri()
+    if live:
+        try:
+            src  = sqlite3.connect(f"{uri}?mode=ro", uri=True, timeout=1)
+            conn = sqlite3.connect(':memory:')
+            try:
+                src.execute("SELECT count(*) FROM sqlite_master")                   # fails if locked, backup() would keep retrying instead
+                src.backup(conn)
+            finally:
+                src.close()
+        except sqlite3.OperationalError as e:
+            print("WARNING: cannot snapshot", dbFile, f"({e}), reading it as immutable, recent changes still in its WAL are missed", file=sys.stderr)
+            conn = sqlite3.connect(f"{uri}?mode=ro&immutable=1", uri=True)
+    else:
+        conn = sqlite3.connect(f"{uri}?mode=ro", uri=True)
+
+    conn.text_factory = lambda b: b.decode('utf-8', errors='replace')
+    conn.execute(f"PRAGMA mmap_size={1<<30}")                                       # map up to 1GB of the file instead of copying pages
+    conn.execute(f"PRAGMA cache_size={-(1<<16)}")                                   # 64MB page cache (negative means KiB)
+    return conn
+
+
+def readSqliteBookmarks(dbFile, live=False):
+    """convert hierarchy implict in table back into explicit one:
+       a recursive query yields the rows already in depth first order (children in id order), together with their depth,
+       so the tree is never built in memory and the traversal needs no (python) recursion
+    """
+
+    conn = connectPlacesDb(dbFile, live=live)
     cur = conn.cursor()
-    allDict = {}
 
-    sqry = """SELECT mb.id, mb.title, mb.type, mb.parent, mb.dateAdded, mp.url
+    sqry = """SELECT mb.parent
                 FROM moz_bookmarks mb
-           LEFT JOIN moz_places mp ON mb.fk=mp.id
+               WHERE mb.parent!=0 AND NOT EXISTS (SELECT 1 FROM moz_bookmarks p WHERE p.id=mb.parent)
             ORDER BY mb.id ASC"""
-    cur.execute(sqry)
-    for (id, title, type, parent, dateAdded, url) in cur.fetchall():                # print(id, cleanName(title), parent)
-        allDict[id] = {'id':        id,
-                       'name':      title,
-                       'url':       url,
-                       'type':      type,
-                       'parent':    parent,
-                       'dateAdded': dateAdded}
+    for (prnt,) in cur.execute(sqry):
+        print('Failed to find parent with id=', prnt, file=sys.stderr)
+        if stats: stats.count('skipped')
+
+    yield (0, 'root', None, None, True, None, None, None)                           # root of the tree, its children are the entries with parent 0
+
+    sqry = """WITH RECURSIVE tree(id, depth, sortKey) AS (
+                     SELECT id, 1, printf('%012d', id)
+                       FROM moz_bookmarks
+                      WHERE parent=0
+                  UNION ALL
+                     SELECT mb.id, tree.depth+1, tree.sortKey || printf('%012d', mb.id)
+                       FROM moz_bookmarks mb
+                       JOIN tree ON mb.parent=tree.id)
+              SELECT tree.depth, CASE WHEN mb.id=1 THEN 'subroot' ELSE mb.title END, mb.dateAdded, mp.url,
+                     EXISTS (SELECT 1 FROM moz_bookmarks c WHERE c.parent=mb.id)
+                FROM tree
+                JOIN moz_bookmarks mb ON mb.id=tree.id
+           LEFT JOIN moz_places mp ON mb.fk=mp.id
+            ORDER BY tree.sortKey"""
+    for (depth, title, dateAdded, url, isFolder) in cur.execute(sqry):              # rows are streamed from the cursor, not fetched all at once
+        yield (depth, title, dateAdded, url, bool(isFolder), None, None, None)
     conn.close()
 
-    allDict[0] = {'id':0, 'name':'root', 'children':[1]}                            # make tree by getting each parent to point to children
-    for id in allDict:                                                              # print(id, [ (k, allDict[id][k]) for k in allDict[id] if k!='children' ] )
-        if 'parent' in allDict[id]:
-            prnt = allDict[id]['parent']
-            if prnt in allDict:
-                if 'children' not in allDict[prnt]: allDict[prnt]['children'] = []
-                allDict[prnt]['children'] += [id]                                   # print(prnt,allDict[prnt]['children'])
-            else:
-                print('Failed to find parent with id=', prnt, file=sys.stderr)
-    allDict[1]['name'] = 'subroot'
-
-    return allDict
-
-def dftSqliteDict(fldrPath, node, allDict, outFmt, depth=0):
-    """depth first traversal of dict derived from moz_bookmarks sqlite tables
+def dftNodes(fldrPath, nodes, outFmt):
+    """depth first traversal of a node stream, the common output of the readers (see inputReaders): one
+       (depth, name, dateAdded, url, isFolder, lastModified, lastVisited, details) tuple per folder or bookmark, in depth
+       first order, dates in microseconds since 1970 (or None). A node is in the last folder before it of a lower depth
+       (children usually have their parent's depth+1). details: None, or a dict of any of iconUri, icon, lastCharset and
+       description (the text of an html <DD>)
     """
 
-    if 'children' in node:
-        subFldrPath = makeBookmarkFolderDir(depth, node['name'], fldrPath=fldrPath)
-        for c in node['children']: dftSqliteDict(subFldrPath, allDict[c], allDict, outFmt, depth+1)
-    else:
-        outFile, fileDate = makeBookmarkFile(depth, node['name'], node['url'], outFmt, add_date=node['dateAdded'], date_scaling=1000000, fldrPath=fldrPath)
-        closeUrlFile(outFile, fileDate)
+    fldrs = [(-1, fldrPath)]                                                        # (depth, path) of the folders of the current branch
+    for (depth, name, dateAdded, url, isFolder, lastModified, lastVisited, details) in nodes:
+        while fldrs[-1][0]>=depth: fldrs.pop()
+        if isFolder:
+            fldrs.append((depth, makeBookmarkFolderDir(depth, name, fldrPath=fldrs[-1][1])))
+        elif details is None:
+            outFile, fileDate = makeBookmarkFile(depth, name, url, outFmt, add_date=dateAdded, last_visited=lastVisited, last_modified=lastModified,
+                                                 date_scaling=1000000, fldrPath=fldrs[-1][1])
+            closeUrlFile(outFile, fileDate)
+        else:
+            outFile, fileDate = makeBookmarkFile(depth, name, url, outFmt, add_date=dateAdded, last_visited=lastVisited, last_modified=lastModified,
+                                                 icon_uri=details.get('iconUri'), icon=details.get('icon'), last_charset=details.get('lastCharset'),
+                                                 date_scaling=1000000, fldrPath=fldrs[-1][1])
+            if 'description' in details and outFile!=sys.stdout:
+                print('DESCRIPTION:', details['description'], file=outFile)       # written into the url file after the bookmark
+            closeUrlFile(outFile, fileDate)
 
 
 # Notes: typical sqlite moz_ tables structure
@@ -206,34 +652,228 @@ def dftSqliteDict(fldrPath, node, allDict, outFmt, depth=0):
 #
 # scrub the database of dodgy characters otherwise sqlite barfs, e.g.
 #  sqlite3 firefox_places.sqlite '.dump' | strings | sqlite3 firefox_places_clean.sqlite
+# (connectPlacesDb now decodes such text with replacement characters, and --live reads a profile's places.sqlite in place)
 
 
 # ------------------------------------------------------------------------- convert json
 
+mozLz4Suffixes = ('.jsonlz4', '.mozlz4', '.baklz4')                              # firefox's (automatic) bookmark backups
+mozLz4Magic    = b'mozLz40\0'
+
+def lz4BlockDecompress(src, size=None):
+    """decompress a raw lz4 block (pure python, for when the lz4 package isn't installed)
+    """
+
+    dst = bytearray()
+    i, n = 0, len(src)
+    while i<n:
+        token  = src[i]; i += 1
+        litLen = token >> 4
+        if litLen==15:                                                             # lengths of 15 and more continue in following bytes
+            while True:
+                litLen += src[i]; i += 1
+                if src[i-1]!=255: break
+        dst += src[i:i+litLen]; i += litLen
+        if i>=n: break                                                             # the last sequence only has literals
+        offset = src[i] | (src[i+1] << 8); i += 2
+        mtchLen = token & 15
+        if mtchLen==15:
+            while True:
+                mtchLen += src[i]; i += 1
+                if src[i-1]!=255: break
+        mtchLen += 4
+        start = len(dst) - offset
+        if offset>=mtchLen: dst += dst[start:start+mtchLen]
+        else:               dst += (dst[start:] * (mtchLen//offset + 1))[:mtchLen] # overlapping match repeats the last offset bytes
+    if size is not None and len(dst)!=size: raise ValueError(f"lz4 block decompressed to {len(dst)} bytes, expected {size}")
+    return bytes(dst)
+
+
+def readMozLz4(infile):
+    """decompress a firefox mozlz4 file (magic, 32 bit decompressed size, lz4 block) in memory
+    """
+
+    with open(infile, 'rb') as source: data = source.read()
+    if not data.startswith(mozLz4Magic): raise ValueError(f"{infile} is not a mozlz4 file")
+    if lz4: return lz4.block.decompress(data[len(mozLz4Magic):])                  # lz4 reads the size prefix itself
+    return lz4BlockDecompress(memoryview(data)[len(mozLz4Magic)+4:], int.from_bytes(data[len(mozLz4Magic):len(mozLz4Magic)+4], 'little'))
+
+
+def isMozLz4(infile):
+    with open(infile, 'rb') as source: return source.read(len(mozLz4Magic))==mozLz4Magic
+
+
 def readJsonBookmarks(infile):
     print("reading FILE", infile, file=sys.stderr)
+    if isMozLz4(infile): return json.loads(readMozLz4(infile))
     with open(infile, 'r') as source: data = json.load(source)
     return data
 
-def dftJson(fldrPath, jData, outFmt, depth=0):
-    """depth first traversal of json
+def jsonNode(jData, depth):
+    """the node (see dftNodes) of a firefox json bookmark or container, None for those skipped (separators, queries ..)
     """
     name = jData['name'] if 'name' in jData else jData['title']
 
     if jData['type']=='text/x-moz-place-container':
-        subFldrPath = makeBookmarkFolderDir(depth, name, fldrPath=fldrPath)
-        for c in jData['children']: dftJson(subFldrPath, c, outFmt, depth+1)
+        return (depth, name, jData.get('dateAdded'), None, True, jData.get('lastModified'), None, None)
 
     elif jData['type']=='text/x-moz-place' and jData['title'] not in ('Recently Bookmarked','Recent Tags', 'Most Visited'):
         if 'dateAdded' in jData:
-            url = jData['url' if 'url' in jData else 'uri']
-            outFile, fileDate = makeBookmarkFile(depth, name, url, outFmt, add_date=jData['dateAdded'], last_modified=jData['lastModified'], date_scaling=1000000, fldrPath=fldrPath)
-            closeUrlFile(outFile, fileDate)
-        else:
-            print(jData['type'], list(jData.items()), file=sys.stderr)
+            return (depth, name, jData['dateAdded'], jData['url' if 'url' in jData else 'uri'], False, jData.get('lastModified'), None, None)
+        print(jData['type'], list(jData.items()), file=sys.stderr)
+        if stats: stats.count('skipped')
     else:
         print('skipped', jData['type'], jData['title'], file=sys.stderr)
-        # print(jData, file=sys.stderr)
+        if stats: stats.count('skipped')
+    return None
+
+
+def jsonNodes(jData, depth=0):
+    """node stream (see dftNodes) of a firefox bookmarks json tree as readJsonBookmarks loads it (or of a node of it at depth),
+       walked with a stack of children iterators rather than recursion
+    """
+
+    stack = [(depth, iter((jData,)))]
+    while stack:
+        depth, children = stack[-1]
+        jData = next(children, None)
+        if jData is None:
+            stack.pop()
+            continue
+        node = jsonNode(jData, depth)
+        if node is None: continue
+        yield node
+        if node[4]: stack.append((depth+1, iter(jData.get('children', ()))))   # (an empty folder may have none)
+
+
+jsonWsSep     = ' \t\n\r,:'                                                         # separators are skipped, the structure comes from the brackets
+jsonNumberRe  = re.compile(r'-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?')
+jsonNumSpanRe = re.compile(r'[-+0-9.eE]+')
+jsonLiterals  = {'t':('true', True), 'f':('false', False), 'n':('null', None)}
+
+def iterJsonEvents(source, chunkSize=1<<16):
+    """incremental json tokenizer, reads source in chunks and yields ijson.basic_parse style (event, value) pairs:
+       start_map, map_key, end_map, start_array, end_array, string, number, boolean, null
+       (the fallback for when ijson isn't installed, it doesn't validate the json)
+    """
+
+    buf, pos, eof = '', 0, False
+    cntnrs = []                                                                    # per open container: 'k' object expecting a key, 'v' expecting a value, 'a' array
+
+    while True:
+        while pos<len(buf) and buf[pos] in jsonWsSep: pos += 1
+        if pos>=len(buf):
+            if eof: return
+            chunk = source.read(chunkSize)
+            buf, pos, eof = buf[pos:]+chunk, 0, not chunk
+            continue
+
+        ch = buf[pos]
+        if ch in '{[':
+            pos += 1
+            cntnrs.append('k' if ch=='{' else 'a')
+            yield ('start_map' if ch=='{' else 'start_array', None)
+            continue
+
+        if ch in '}]':
+            pos += 1
+            cntnrs.pop()
+            yield ('end_map' if ch=='}' else 'end_array', None)
+        else:
+            try:                                                                   # a scalar, which may be cut off by the end of the buffer
+                if ch=='"':
+                    val, end = json.decoder.scanstring(buf, pos+1)
+                    event    = 'map_key' if cntnrs and cntnrs[-1]=='k' else 'string'
+                elif ch in jsonLiterals:
+                    lit, val = jsonLiterals[ch]
+                    if buf[pos:pos+len(lit)]!=lit: raise json.JSONDecodeError("Expecting "+lit, buf, pos)
+                    end, event = pos+len(lit), 'null' if val is None else 'boolean'
+                else:
+                    span = jsonNumSpanRe.match(buf, pos)
+                    mtch = span and jsonNumberRe.fullmatch(span.group())
+                    if not mtch or (span.end()==len(buf) and not eof): raise json.JSONDecodeError("Expecting number", buf, pos)
+                    end, event = span.end(), 'number'
+                    val = float(mtch.group()) if mtch.group(1) or mtch.group(2) else int(mtch.group())
+            except json.JSONDecodeError:
+                if eof: raise
+                chunk = source.read(chunkSize)                                     # read on and retry the token
+                buf, pos, eof = buf[pos:]+chunk, 0, not chunk
+                continue
+            pos = end
+            yield (event, val)
+            if event=='map_key':
+                cntnrs[-1] = 'v'
+                continue
+
+        if cntnrs and cntnrs[-1]=='v': cntnrs[-1] = 'k'                            # a complete value, the enclosing object now expects a key again
+        if pos>chunkSize: buf, pos = buf[pos:], 0                                  # drop what has been consumed
+
+
+def readJsonEvents(infile):
+    """stream (event, value) pairs from a json file, using ijson if it is installed
+    """
+
+    print("reading FILE", infile, file=sys.stderr)
+    if isMozLz4(infile):                                                          # decompressed in memory, only the parsed tree isn't built
+        data = readMozLz4(infile)
+        if ijson: yield from ijson.basic_parse(BytesIO(data), use_float=True)
+        else:     yield from iterJsonEvents(StringIO(data.decode('utf-8')))
+    elif ijson:
+        with open(infile, 'rb') as source: yield from ijson.basic_parse(source, use_float=True)
+    else:
+        with open(infile, 'r', encoding='utf-8') as source: yield from iterJsonEvents(source)
+
+
+def buildJsonValue(event, value, events):
+    """build the (nested) value that starts with event from the rest of the events, like json.load would
+    """
+
+    if event not in ('start_map', 'start_array'): return value
+    stack, key = [{} if event=='start_map' else []], None
+    for event, value in events:
+        if   event=='map_key':                   key = value; continue
+        elif event in ('start_map', 'start_array'): value = {} if event=='start_map' else []
+        elif event in ('end_map', 'end_array'):
+            value = stack.pop()
+            if not stack: return value
+            continue
+        prnt = stack[-1]
+        if isinstance(prnt, list): prnt.append(value)
+        else:                      prnt[key] = value
+        if event in ('start_map', 'start_array'): stack.append(value)
+
+
+def jsonEventNodes(events):
+    """node stream (see dftNodes) of the json events of readJsonEvents, the same as jsonNodes of the loaded json.
+       Each node's fields are collected until its "children" start, then a container's node is yielded and its children
+       are streamed, so memory depends on the depth of the tree and not on the size of the file.
+       (a node whose type or name only come after its children is built whole and handed to jsonNodes)
+    """
+
+    nodes = []                                                                     # per open node: [depth, fields, key, streamed]
+    for event, value in events:
+        node = nodes[-1] if nodes else None
+
+        if event=='start_map' and (node is None or (node[3] and node[2]=='children')):   # a node: the root or a child of a streamed container
+            nodes.append([node[0]+1 if node else 0, {}, None, False])
+
+        elif event=='end_map':
+            nodes.pop()
+            if not node[3]: yield from jsonNodes(node[1], node[0])                # not a streamed container: a place, or anything unusual
+
+        elif event=='end_array' and node[2]=='children':
+            node[2] = None
+
+        elif event=='map_key':
+            node[2] = value
+
+        elif node[2]=='children' and event=='start_array' and node[1].get('type')=='text/x-moz-place-container' and ('name' in node[1] or 'title' in node[1]):
+            yield jsonNode(node[1], node[0])
+            node[3] = True
+
+        else:
+            node[1][node[2]] = buildJsonValue(event, value, events)
+            node[2] = None
 
 
 # Notes: typical json structure:
@@ -263,57 +903,238 @@ def readHtmlBookmarks(inFile):
     sio.close()
     return pTree
 
-def dftHtml(fldrPath, el, outFmt, depth=0):
-    """depth first traversal to create fh (=file hierarchy)
+def htmlDateMicros(date):
+    return int(date)*1000000 if date else None                                     # (html dates are in seconds)
+
+
+def htmlNode(depth, attrs, text, descr=None):
+    """the node (see dftNodes) of an anchor, with its icon, charset and the text of a following <DD> as its details
     """
+    details = {k:v for k,v in (('iconUri', attrs.get('icon_uri')), ('icon', attrs.get('icon')), ('lastCharset', attrs.get('last_charset')),
+                               ('description', descr)) if v is not None}
+    return (depth, text, htmlDateMicros(attrs.get('add_date')), attrs.get('href'), False, None, htmlDateMicros(attrs.get('last_visit')), details or None)
 
-    if not fldrPath: outFile = sys.stdout
 
-    subFldr  = ''
-    numChlds = len(el)
-    for ei,e in enumerate(el):                                                     # typical keys: ['href', 'add_date', 'last_modified', 'icon_uri', 'icon', 'last_charset']         # print(" "*4*depth, "DEBUG", e.tag, e.text, e.keys(), f'chlds={len(e)}', fldrPath) # debug
+def htmlNodes(root):
+    """node stream (see dftNodes) of a parsed html bookmarks file (readHtmlBookmarks), walked depth first with a stack of
+       children iterators: a node's depth is that of its element, its folder is the last preceding <H3> of lower depth
+    """
 
-        if e.tag=='a' and e.text:                                                  # print(indntStr*depth, fldrPath / cleanName(e.text)) #, e.get('href') print(indent*depth, e.tag, e.get('href'), e.text)
+    stack = [(0, root, iter(enumerate(root)))]
+    while stack:
+        depth, el, children = stack[-1]
+        ei, e = next(children, (None, None))
+        if e is None:
+            stack.pop()
+            continue                                                               # typical keys: ['href', 'add_date', 'last_modified', 'icon_uri', 'icon', 'last_charset']
 
-            try:
-                outFile, fileDate = makeBookmarkFile(depth, e.text, e.get('href'), outFmt, add_date=e.get('add_date'), last_visited=e.get('last_visit'), icon_uri=e.get('icon_uri'), icon=e.get('icon'), last_charset=e.get('last_charset'), fldrPath=fldrPath)
-            except Exception as e:
-                print(e)
-                print(e.keys())
-                print("FAILED ON", e.text)
-                closeUrlFile(outFile)
-                sys.exit()
-            if ei+1<numChlds-1 and el[ei+1].tag=='dd':                             # lookahead in case there is a further DESCRIPTON of the anchor, right after it
-                if outFile!=sys.stdout:
-                    print('DESCRIPTION:', el[ei+1].text.strip(), file=outFile)     # sometimes (rarely, but it happens) a <DT> is followed by a descriptive <DD> that should also be written into the url file
-            if fldrPath: closeUrlFile(outFile, fileDate)
+        if e.tag=='a' and e.text:
+            descr = None
+            if ei+1<len(el)-1 and el[ei+1].tag=='dd':                              # lookahead in case there is a further DESCRIPTON of the anchor, right after it
+                descr = (el[ei+1].text or '').strip()                              # sometimes (rarely, but it happens) a <DT> is followed by a descriptive <DD>
+            yield htmlNode(depth, e.attrib, e.text, descr)
 
         elif e.tag=='h3':
+            yield (depth, e.text, None, None, True, None, None, None)
 
-            maybePath = makeBookmarkFolderDir(depth, e.text, fldrPath=fldrPath)
-            if maybePath: subFldr = maybePath.parts[-1]
+        elif e.tag in htmlDftTags:                                                 # keep recursing down
+            stack.append((depth+1, e, iter(enumerate(e))))
 
-        elif e.tag in ['dl','dt','p','head','body']:                               # keep recursing down
 
-            if fldrPath: subpath = Path(fldrPath) / Path(subFldr)
-            else:        subpath = None
-            dftHtml(subpath, e, outFmt, depth+1)
+htmlDftTags     = ('dl','dt','p','head','body')                                  # elements whose children htmlNodes walks
+htmlRestartTags = ('html','body','dl')                                            # open elements the pull parser can safely be restarted inside
+htmlRestartSize = 1<<24                                                           # bytes fed before restarting the pull parser (libxml2 keeps all input fed to it buffered)
+
+def iterHtmlBookmarks(inFile):
+    """node stream (see dftNodes) of an html bookmarks file, the same as htmlNodes of the parsed file, streamed line by line
+       through lxml's pull parser: an anchor's node comes once the next sibling shows whether a <DD> describes it.
+       Each element is cleared as soon as it is handled, and the parser is restarted every htmlRestartSize bytes
+       (re-opening the currently open <dl>s) so that memory stays flat regardless of the file size
+    """
+
+    frames = []                                                                    # per open element: [tag, walked, childDepth, pendingAnchor, ddState, ddText]
+
+    def flush(frm, descr=None):
+        depth, attrs, text = frm[3]
+        frm[3:] = [None, None, None]
+        return htmlNode(depth, attrs, text, descr)
+
+    def handle(event, el):
+        if event=='start':
+            prnt = frames[-1] if frames else None
+            if prnt is None:                                                       # the root <html> element, htmlNodes walks its children
+                frames.append([el.tag, True, 0, None, None, None])
+                return
+            if prnt[1] and prnt[3]:                                                # the sibling after a pending anchor decides its description
+                if   prnt[4]=='dd': yield flush(prnt, prnt[5])                    # a <DD> that is not the last child describes the anchor
+                elif el.tag=='dd':  prnt[4] = 'wait'
+                else:               yield flush(prnt)
+            frames.append([el.tag, prnt[1] and el.tag in htmlDftTags, prnt[2]+1, None, None, None])
+        else:
+            frm  = frames.pop()
+            prnt = frames[-1] if frames else None
+            if frm[1] and frm[3]: yield flush(frm)                                 # anchor (or anchor + dd) was the last child
+            if prnt is not None and prnt[1]:
+                depth = prnt[2]
+                if   el.tag=='a' and el.text:           prnt[3] = (depth, dict(el.attrib), el.text)
+                elif el.tag=='h3':                     yield (depth, el.text, None, None, True, None, None, None)
+                elif el.tag=='dd' and prnt[4]=='wait': prnt[4:] = ['dd', (el.text or '').strip()]
+            el.clear()
+            if el.getparent() is not None:
+                while el.getprevious() is not None: del el.getparent()[0]          # drop already handled siblings
+
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    skip   = 0                                                                     # start events of a restarted parser's re-opened elements
+    fed    = 0
+    with open(inFile, 'r') as infile:
+        for ln in infile:
+            lnClean = cleanupLine(ln)
+            parser.feed(lnClean)
+            for event, el in parser.read_events():
+                if skip: skip -= 1
+                else:    yield from handle(event, el)
+            fed += len(lnClean)
+            if fed>htmlRestartSize and frames and all(f[0] in htmlRestartTags for f in frames):
+                parser.close()                                                     # free the old parser and its buffer, its closing events are not read
+                parser = etree.HTMLPullParser(events=('start', 'end'))
+                skip   = len(frames)
+                parser.feed(''.join(f'<{f[0]}>' for f in frames))
+                fed    = 0
+    parser.close()
+    for event, el in parser.read_events():
+        if skip: skip -= 1
+        else:    yield from handle(event, el)
+
+
+# ------------------------------------------------------------------------- convert chromium (chrome, edge, brave ..)
+
+webkitEpochOffset = 11644473600*1000000                                            # microseconds from 1601-01-01 (chromium's epoch) to 1970-01-01
+
+def webkitToUnixMicros(webkitTime):
+    """chromium's microseconds since 1601 (int, or the strings of the Bookmarks json) as microseconds since 1970, None for 0 (never)
+    """
+
+    webkitTime = int(webkitTime or 0)
+    return webkitTime-webkitEpochOffset if webkitTime>0 else None
+
+
+def readChromiumBookmarks(infile):
+    """node stream (see dftNodes) of a chromium Bookmarks json file (see the notes on its structure above):
+       its roots (bookmarks bar, other, mobile) as top folders. The file is small enough to load whole, the
+       nodes are then walked with a stack, without recursion
+    """
+
+    print("reading FILE", infile, file=sys.stderr)
+    with open(infile, 'r', encoding='utf-8-sig') as source: data = json.load(source)
+    stack = [(0, root) for root in reversed(list(data['roots'].values())) if isinstance(root, dict)]  # (roots also has a sync_transaction_version string)
+    while stack:
+        depth, node = stack.pop()
+        if node.get('type')=='folder':
+            yield (depth, node.get('name', ''), webkitToUnixMicros(node.get('date_added')), None, True, webkitToUnixMicros(node.get('date_modified')), None, None)
+            stack.extend((depth+1, child) for child in reversed(node.get('children', [])))
+        elif node.get('type')=='url':
+            yield (depth, node.get('name') or node['url'], webkitToUnixMicros(node.get('date_added')), node['url'], False,
+                   None, webkitToUnixMicros(node.get('date_last_used')), None)
+        else:
+            print('skipped', node.get('type'), node.get('name'), file=sys.stderr)
+            if stats: stats.count('skipped')
+
+
+def readChromiumHistory(dbFile, live=False):
+    """node stream (see dftNodes) of the urls of a chromium History sqlite db, in a folder per month (local time) of their
+       last visit, oldest first: the date added is the first visit still recorded, the visited date the last one
+    """
+
+    conn = connectPlacesDb(dbFile, live=live)                                       # (read-only and snapshots work for any sqlite db)
+    sqry = """SELECT u.url, u.title, MIN(v.visit_time), u.last_visit_time
+                FROM urls u
+           LEFT JOIN visits v ON v.url=u.id
+               WHERE u.hidden=0
+            GROUP BY u.id
+            ORDER BY u.last_visit_time, u.id"""
+    month = None
+    for (url, title, firstVisit, lastVisit) in conn.execute(sqry):
+        lastVisit = webkitToUnixMicros(lastVisit)
+        urlMonth  = unixEpochToIsoDateTime(lastVisit/1000000)[:7].replace('-', '_') if lastVisit else 'never_visited'
+        if urlMonth!=month:
+            yield (0, urlMonth, None, None, True, None, None, None)
+            month = urlMonth
+        yield (1, title or url, webkitToUnixMicros(firstVisit) or lastVisit, url, False, None, lastVisit, None)
+    conn.close()
+
+# Notes: chromium History tables used (webkit times, microseconds since 1601)
+# urls   (id INTEGER PRIMARY KEY, url LONGVARCHAR, title LONGVARCHAR, visit_count INTEGER, typed_count INTEGER, last_visit_time INTEGER NOT NULL, hidden INTEGER DEFAULT 0 NOT NULL)
+# visits (id INTEGER PRIMARY KEY, url INTEGER NOT NULL, visit_time INTEGER NOT NULL, from_visit INTEGER, transition INTEGER DEFAULT 0 NOT NULL, ...)
+
 
 # ------------------------------------------------------------------------- other html functions
 
-def compareHtmlFiles(htmlDir, lim=100):
-    """independent function to give a measure of how similar pairs of html bookmark files are
+def readHtmlLineSet(f):
+    """the distinct lines of a file with their leading whitespace removed (as sed 's/^[ \t]*//' | sort -u), as a set of hashes
     """
-    allFiles = glob(htmlDir+"/*.html")[:lim]
-    for ai,fa in enumerate(allFiles):
-        for bi in range(ai+1, len(allFiles)):
-            fb = allFiles[bi]
-            os.system(f"sed 's/^[ \t]*//g' {fa} | sort -u > /tmp/t1")
-            fas = int(subprocess.getoutput(f'wc -l /tmp/t1').split()[0])
-            os.system(f"sed 's/^[ \t]*//g' {fb} | sort -u > /tmp/t2")
-            fbs = int(subprocess.getoutput(f'wc -l /tmp/t2').split()[0])
-            result = int(subprocess.getoutput(f'comm -12 /tmp/t1 /tmp/t2 | wc -l'))
-            if result>0: print(f"{float(result/max(fas,fbs)):5.4f} {result:5d} {fas:5d} {fbs:5d} ", fa, fb)
+
+    with open(f, 'r', errors='replace') as infile:
+        return frozenset(hash(ln.lstrip(' \t').rstrip('\n')) for ln in infile)
+
+
+emptyBin = 1<<64                                                                  # minhash of a bin no hash fell into (values are below it)
+
+
+def minHashSignature(lineSet, numHashes=128):
+    """one permutation minhash signature of a set of hashes: each hash falls into one of numHashes bins, keep the smallest in each.
+       The empty bins of a small set are densified by rotation: they take the value of the next non-empty bin (circularly),
+       offset by the distance, so two small sets don't agree on bands of empty bins. Only an empty set keeps emptyBin
+    """
+
+    sig = [emptyBin]*numHashes
+    for h in lineSet:
+        h = (h * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF                          # scramble the (string) hash so bins are uniform
+        b, v = h % numHashes, h // numHashes
+        if v<sig[b]: sig[b] = v
+    if emptyBin in sig and len(lineSet):
+        offset = emptyBin//numHashes + 1                                           # above any value, so a borrowed value tells its distance
+        dense  = list(sig)
+        for b in range(numHashes):
+            t = 1
+            while dense[b]==emptyBin:
+                if sig[(b+t)%numHashes]!=emptyBin: dense[b] = sig[(b+t)%numHashes] + t*offset
+                t += 1
+        sig = dense
+    return sig
+
+
+def compareHtmlFiles(htmlDir, lim=None, threshold=0.5, numHashes=128, rows=2):
+    """independent function to give a measure of how similar pairs of html bookmark files are:
+       each file is read once into a set of its lines, candidate pairs are found by locality sensitive hashing
+       of their minhash signatures (bands of rows), and only those pairs are compared exactly.
+       Prints (and returns) the pairs sharing at least threshold of the lines of the larger file, most similar first,
+       as: similarity, shared lines, lines in a, lines in b, a, b
+    """
+
+    allFiles = sorted(glob(htmlDir+"/*.html"))[:lim]
+    lineSets = [readHtmlLineSet(f) for f in allFiles]
+
+    buckets = {}                                                                   # (band, band of signature) -> files
+    for fi, lineSet in enumerate(lineSets):
+        sig = minHashSignature(lineSet, numHashes)
+        for bnd in range(0, numHashes, rows):
+            if emptyBin in sig[bnd:bnd+rows]: continue                             # (an empty file) no evidence of similarity
+            buckets.setdefault((bnd, tuple(sig[bnd:bnd+rows])), []).append(fi)
+
+    candidates = set()
+    for fis in buckets.values():
+        for ai, fa in enumerate(fis):
+            for fb in fis[ai+1:]: candidates.add((fa, fb))
+
+    results = []
+    for fa, fb in candidates:
+        fas, fbs = len(lineSets[fa]), len(lineSets[fb])
+        result   = len(lineSets[fa] & lineSets[fb])
+        if result>0 and result/max(fas,fbs)>=threshold: results.append((result/max(fas,fbs), result, fas, fbs, allFiles[fa], allFiles[fb]))
+
+    results.sort(key=lambda r: (-r[0], r[4], r[5]))
+    for sim, result, fas, fbs, fa, fb in results: print(f"{sim:5.4f} {result:5d} {fas:5d} {fbs:5d} ", fa, fb)
+    return results
 
 # ------------------------------------- GLOBAL VAR
 indntStr = "   "       # indentation string when writing to stdout
@@ -352,12 +1173,715 @@ def dftPrint(el, path='', depth=0):
 #   ['href', 'add_date', 'last_modified', 'icon_uri', 'icon', 'last_charset']
 
 
-# ------------------------------------------------------------------------------ main
-if __name__ == "__main__":
+# ------------------------------------------------------------------------- statistics and profiling
+
+class ConvertStats:
+    """counters and cumulative timings of the stages of a conversion, with a progress line on stderr while it runs
+       and a json report at the end. The stages are timed by wrapping the module's functions for them (instrument),
+       so nothing is timed without --stats. Timings are inclusive, e.g. makeBookmarkFolderDir includes its cleanName.
+    """
+
+    stages = ('readHtmlBookmarks', 'iterHtmlBookmarks', 'readJsonBookmarks', 'readJsonEvents', 'readSqliteBookmarks', 'readMozLz4',
+              'readChromiumBookmarks', 'readChromiumHistory',
+              'cleanName', 'makeBookmarkFolderDir', 'makeBookmarkFile', 'closeUrlFile', 'setFileDate', 'writeUrlFile')
+
+    def __init__(self, reportFile='-', progressInterval=None):
+        self.reportFile = reportFile
+        self.counts     = {'bytes':0, 'skipped':0, 'noDate':0, 'failed':0}
+        self.timings    = {}                                                       # stage -> [calls, seconds]
+        self.lock       = threading.Lock()                                         # stages also run on the writer threads
+        self.interval   = progressInterval or (1 if sys.stderr.isatty() else 10)
+        self.start      = self.lastProgress = time.perf_counter()
+
+    def count(self, counter, n=1):
+        with self.lock: self.counts[counter] += n
+
+    def timed(self, stage, func):
+        """func, timing its calls as stage (and, for a reader returning an iterator, the time spent in producing each item)
+        """
+
+        def timedIter(it):
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    self.record(stage, start, calls=0)
+                    return
+                self.record(stage, start)                                          # (calls of a reader are the items it read)
+                yield item
+
+        def timedFunc(*fArgs, **fKwArgs):
+            start  = time.perf_counter()
+            result = func(*fArgs, **fKwArgs)
+            isIter = hasattr(result, '__next__') and not hasattr(result, 'read')
+            self.record(stage, start, calls=0 if isIter else 1)
+            return timedIter(result) if isIter else result
+
+        timedFunc.__wrapped__ = func
+        return timedFunc
+
+    def record(self, stage, start, calls=1):
+        now = time.perf_counter()
+        with self.lock:
+            timing     = self.timings.setdefault(stage, [0, 0.0])
+            timing[0] += calls
+            timing[1] += now - start
+        if now-self.lastProgress > self.interval: self.progress(now)
+
+    def progress(self, now):
+        self.lastProgress = now
+        secs  = now - self.start
+        onTty = sys.stderr.isatty()                                                # overwrite the line on a terminal, a line each time in a log
+        print(f"{secs:8.1f}s {convertCounts['bookmarks']:10d} bookmarks {convertCounts['folders']:8d} folders {convertCounts['bookmarks']/secs:9.0f}/s"
+              f" {self.counts['bytes']/(1<<20):9.1f} MB", end='\r' if onTty else '\n', file=sys.stderr, flush=True)
+
+    def take(self):
+        """the counts and timings so far, starting again from zero: what a batch worker hands back with each file it converted
+        """
+
+        with self.lock:
+            taken = (self.counts, self.timings)
+            self.counts, self.timings = dict.fromkeys(self.counts, 0), {}
+        return taken
+
+    def add(self, counts, timings):
+        """add what a batch worker took (the timings of a stage are summed over the workers)
+        """
+
+        with self.lock:
+            for counter, n in counts.items(): self.counts[counter] += n
+            for stage, (calls, seconds) in timings.items():
+                timing     = self.timings.setdefault(stage, [0, 0.0])
+                timing[0] += calls
+                timing[1] += seconds
+        now = time.perf_counter()
+        if now-self.lastProgress > self.interval: self.progress(now)
+
+    def instrument(self, namespace):
+        for stage in self.stages: namespace[stage] = self.timed(stage, namespace[stage])
+
+    def uninstrument(self, namespace):
+        for stage in self.stages: namespace[stage] = getattr(namespace[stage], '__wrapped__', namespace[stage])
+
+    def report(self, **extra):
+        secs   = time.perf_counter() - self.start
+        report = {**extra,
+                  'seconds':        round(secs, 3),
+                  'counts':         {**convertCounts, **self.counts},
+                  'bookmarksPerSec':round(convertCounts['bookmarks']/secs) if secs else None,
+                  'stages':         {stage:{'calls':calls, 'seconds':round(seconds, 4)} for stage, (calls, seconds) in sorted(self.timings.items(), key=lambda t: -t[1][1])}}
+        if sys.stderr.isatty(): print(file=sys.stderr)                            # end the progress line
+        if self.reportFile in (None, '-'):
+            print(json.dumps(report, indent=1), file=sys.stderr)
+        else:
+            with open(self.reportFile, 'w') as f: json.dump(report, f, indent=1)
+        return report
+
+
+def runInstrumented(run, statsFile=None, profileFile=None, **reportExtra):
+    """call run() with --stats (a ConvertStats report into statsFile, - for stderr) and/or --profile (a cProfile dump into profileFile)
+    """
+    global stats
+
+    if statsFile:
+        stats = ConvertStats(statsFile)
+        stats.instrument(globals())
+    profiler = cProfile.Profile() if profileFile else None
+    if profiler: profiler.enable()
+    try:
+        return run()
+    finally:
+        if profiler:
+            profiler.disable()
+            profStats = pstats.Stats(profiler, stream=sys.stderr)
+            for prof in batchProfiles:                                             # (a batch: the workers' files)
+                profStats.add(prof)
+                os.remove(prof)
+            batchProfiles.clear()
+            profStats.dump_stats(profileFile)
+            profStats.sort_stats('cumulative').print_stats(20)
+        if stats:
+            stats.report(**reportExtra)
+            stats.uninstrument(globals())
+            stats = None
+
+# ------------------------------------------------------------------------- convert a file, or a whole archive of files
+
+inputSuffixes = ('.sqlite', '.json', '.html') + mozLz4Suffixes                   # what a folder or glob of inputs is searched for
+inputNames    = ('Bookmarks', 'History')                                            # chromium's files have no suffix
+sqliteMagic   = b'SQLite format 3\0'
+
+def sqliteTables(dbFile):
+    uri = Path(dbFile).resolve().as_uri()
+    with sqlite3.connect(f"{uri}?mode=ro&immutable=1", uri=True) as conn:           # (just the schema, even if a browser has it locked)
+        return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+def jsonHead(head): return head.lstrip(b'\xef\xbb\xbf \t\r\n')                    # (without a utf-8 bom)
+
+def placesJsonNodes(inFile):
+    return jsonEventNodes(readJsonEvents(inFile)) if args.stream else jsonNodes(readJsonBookmarks(inFile))
+
+def netscapeHtmlNodes(inFile):
+    return iterHtmlBookmarks(inFile) if args.stream else htmlNodes(readHtmlBookmarks(inFile).getroot())
+
+inputReaders = [                                                                    # GLOBAL VAR: (name, sniff(inFile, head), nodes(inFile)), the first whose sniff is true reads the file
+    ('firefox places.sqlite',   lambda inFile, head: head.startswith(sqliteMagic) and 'moz_bookmarks' in sqliteTables(inFile),
+                                lambda inFile: readSqliteBookmarks(inFile, live=args.live)),
+    ('chromium History',        lambda inFile, head: head.startswith(sqliteMagic) and {'urls', 'visits'}<=sqliteTables(inFile),
+                                lambda inFile: readChromiumHistory(inFile, live=args.live)),
+    ('firefox json',            lambda inFile, head: head.startswith(mozLz4Magic) or (jsonHead(head)[:1]==b'{' and b'"text/x-moz-place' in head),
+                                placesJsonNodes),
+    ('chromium Bookmarks',      lambda inFile, head: jsonHead(head)[:1]==b'{' and b'"roots"' in head,
+                                lambda inFile: readChromiumBookmarks(inFile)),
+    ('netscape bookmarks html', lambda inFile, head: b'<!doctype netscape-bookmark-file' in head.lower() or b'<dl' in head.lower(),
+                                netscapeHtmlNodes),
+]
+
+
+def registerReader(name, sniff, nodes):
+    """add a reader, tried before the built in ones: sniff(inFile, head) tells from the path and the first 64KB of a file whether
+       it is in the reader's format, nodes(inFile) reads it as a node stream (see dftNodes), which every output is made from.
+       (register it at import time if batches are converted, so the worker processes have it too)
+    """
+
+    inputReaders.insert(0, (name, sniff, nodes))
+
+
+def findReader(inFile):
+    """(name, nodes) of the reader for inFile, by its content rather than its name
+    """
+
+    with open(inFile, 'rb') as f: head = f.read(1<<16)
+    for name, sniff, nodes in inputReaders:
+        try:
+            if sniff(inFile, head): return name, nodes
+        except sqlite3.DatabaseError:                                                # e.g. a corrupt sqlite file: not this reader's
+            pass
+    raise ValueError(f"{inFile} is not in a known bookmarks format ({', '.join(name for name, sniff, nodes in inputReaders)})")
+
+
+def isInputFile(path):
+    return (path.suffix in inputSuffixes or path.name in inputNames) and path.is_file()
+
+
+def convertFile(inFile, rootWriteFldr, outFmt):
+    """convert one bookmarks file, according to its format, into a hierarchy inside rootWriteFldr (or print it to stdout)
+       returns the numbers of bookmarks and folders made
+    """
+
+    for k in convertCounts: convertCounts[k] = 0
+    openFileWriter(rootWriteFldr)
+    try:     traverseFile(inFile, rootWriteFldr, outFmt)
+    finally: closeFileWriter()
+    return dict(convertCounts)
+
+
+def traverseFile(inFile, rootWriteFldr, outFmt):
+    """read a bookmarks file with the reader for its format and traverse it into rootWriteFldr
+    """
 
+    global parseCache
+
+    if args.parseCache and parseCache is None: parseCache = ParseCache(os.path.expanduser(args.parseCache), maxBytes=args.parseCacheMB<<20)
+    if parseCache is not None: return traverseCached(inFile, rootWriteFldr, outFmt)
+
+    name, nodes = findReader(inFile)
+    if args.verbose: print("DEBUG: reading", inFile, "as", name)
+    dftNodes(rootWriteFldr, nodes(inFile), outFmt)
+
+
+def traverseCached(inFile, rootWriteFldr, outFmt):
+    """traverse inFile's node stream replayed from the parseCache, recording it while it is read if it isn't cached.
+       An input another process is recording is read directly; the recording of an input whose reader fails is dropped
+    """
+
+    key, hit = parseCache.lookup(inFile)
+    if hit:
+        if args.verbose: print("DEBUG: replaying", inFile, "from the parse cache")
+        return dftNodes(rootWriteFldr, parseCache.nodes(key), outFmt)
+
+    name, nodes = findReader(inFile)
+    if not parseCache.begin(key, os.path.getsize(inFile), name):
+        if args.verbose: print("DEBUG: reading", inFile, "as", name, "(being recorded by another process)")
+        return dftNodes(rootWriteFldr, nodes(inFile), outFmt)
+    if args.verbose: print("DEBUG: reading", inFile, "as", name, "into the parse cache")
+    try:
+        dftNodes(rootWriteFldr, parseCache.record(nodes(inFile)), outFmt)
+    except BaseException:
+        parseCache.abandon()
+        raise
+    parseCache.finish()
+
+
+def openFileWriter(rootWriteFldr):
+    """create the write folder and set up the fileWriter asked for by --jobs/--incremental/--archive (if any)
+    """
+    global fileWriter, iconStore, bookmarkIndex
+
+    fileWriter    = None
+    iconStore     = None
+    bookmarkIndex = None
+    if  exporter is not None: return                                               # everything goes into the export file
+    if  rootWriteFldr and args.archive:                                            # everything goes into the archive, rootWriteFldr is the folder inside it
+        fileWriter = ArchiveFileWriter(args.archive)
+        if args.icons: iconStore = IconStore(rootWriteFldr, archive=fileWriter)
+        return
+    if  rootWriteFldr: os.makedirs(rootWriteFldr, exist_ok=True)
+    if  rootWriteFldr and args.icons: iconStore = IconStore(rootWriteFldr)
+    if  rootWriteFldr and args.index:
+        bookmarkIndex = BookmarkIndex(os.path.expanduser(args.index), root=rootWriteFldr)
+        bookmarkIndex.removeTree(rootWriteFldr)                                    # a re-conversion replaces what was indexed of it
+    if  rootWriteFldr and args.jobs>1: fileWriter = ParallelFileWriter(args.jobs)
+    if  rootWriteFldr and args.incremental: fileWriter = IncrementalFileWriter(rootWriteFldr, inner=fileWriter, prune=args.prune)
+
+
+def closeFileWriter():
+    global fileWriter, iconStore, bookmarkIndex
+
+    if bookmarkIndex: bookmarkIndex.close()
+    bookmarkIndex = None
+    if iconStore: iconStore.close()
+    iconStore  = None
+    if fileWriter: fileWriter.close()
+    fileWriter = None
+
+
+def findInputFiles(fileOrGlob):
+    """the bookmark files to convert: the file itself, all bookmark files inside a folder (recursively), or those matching a glob
+    """
+
+    if os.path.isdir(fileOrGlob): return sorted(p for p in Path(fileOrGlob).rglob('*') if isInputFile(p))
+    if os.path.isfile(fileOrGlob): return [Path(fileOrGlob)]
+    return sorted(Path(p) for p in glob(fileOrGlob, recursive=True) if isInputFile(Path(p)))
+
+
+def initBatchWorker(workerArgs):
+    """set up a batch worker process like the main script, whatever the multiprocessing start method
+    """
+    global args, stats
+
+    args = workerArgs
+    if not args.verbose: sys.stdout = open(os.devnull, 'w')                        # folder progress of many files at once is just noise
+    if stats: stats.uninstrument(globals())                                        # (forked from an instrumented main process)
+    stats = None
+    if args.stats:                                                                 # counted and timed here, handed back with each file (convertBatchFile)
+        stats = ConvertStats(None, progressInterval=float('inf'))
+        stats.instrument(globals())
+
+
+def convertBatchFile(inFile, rootWriteFldr, outFmt):
+    """convert one file of a batch, returning (inFile, seconds, counts, error, stats taken, profile dump) instead of raising,
+       the last two with --stats and --profile (else None)
+    """
+
+    startTime = time.perf_counter()
+    profiler  = cProfile.Profile() if args.profile else None
+    if profiler: profiler.enable()
+    try:
+        counts, error = convertFile(inFile, rootWriteFldr, outFmt), None
+    except Exception as e:
+        counts, error = dict(convertCounts), f"{type(e).__name__}: {e}"
+        if args.verbose: traceback.print_exc()
+    profile = None
+    if profiler:
+        profiler.disable()
+        fd, profile = tempfile.mkstemp(suffix='.prof')
+        os.close(fd)
+        profiler.dump_stats(profile)
+    return inFile, time.perf_counter()-startTime, counts, error, stats and stats.take(), profile
+
+
+def batchConvert(inFiles, rootWriteFldr, outFmt, procs=None):
+    """convert each of inFiles into its own sub-folder of rootWriteFldr on a pool of processes, then print a summary
+    """
+
+    stems     = Counter(f.stem for f in inFiles)
+    names     = Counter(f.name for f in inFiles)
+    batchRoot = os.path.commonpath([os.path.abspath(f.parent) for f in inFiles])
+    subFldrs, taken = {}, set()
+    for inFile in inFiles:                                                         # sub-folder named after the file, plus its type if that is ambiguous,
+        if   stems[inFile.stem]==1: subFldr = inFile.stem                         # or its path in the batch if that is too
+        elif names[inFile.name]==1: subFldr = inFile.stem+'_'+inFile.suffix[1:]
+        else:                       subFldr = '_'.join(Path(os.path.abspath(inFile)).relative_to(batchRoot).parts)
+        unique, n = subFldr, 1
+        while unique.lower() in taken:                                             # (e.g. a file named like another's path) never two into one
+            n     += 1
+            unique = f"{subFldr}_{n}"
+        taken.add(unique.lower())
+        subFldrs[inFile] = Path(rootWriteFldr) / unique
+
+    results   = []
+    startTime = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=procs, initializer=initBatchWorker, initargs=(args,)) as pool:
+        ftrs = [pool.submit(convertBatchFile, inFile, subFldrs[inFile], outFmt) for inFile in inFiles]
+        for ftr in as_completed(ftrs):
+            inFile, seconds, counts, error, workerStats, profile = ftr.result()
+            results.append((inFile, seconds, counts, error))
+            for k in convertCounts: convertCounts[k] += counts[k]                  # (for --stats)
+            if stats and workerStats: stats.add(*workerStats)
+            if profile: batchProfiles.append(profile)
+            print(f"{'FAILED' if error else 'done':6s} {seconds:8.2f}s {inFile}", file=sys.stderr)
+
+    print(f"{'seconds':>9s} {'bookmarks':>9s} {'folders':>8s}  file")
+    for inFile, seconds, counts, error in sorted(results):
+        print(f"{seconds:9.2f} {counts['bookmarks']:9d} {counts['folders']:8d}  {inFile} -> {subFldrs[inFile]}" + (f"  FAILED {error}" if error else ""))
+    failed = [r for r in results if r[3]]
+    print(f"{len(results)} files, {sum(r[2]['bookmarks'] for r in results)} bookmarks, {len(failed)} failed, {time.perf_counter()-startTime:.2f}s")
+    return len(failed)==0
+
+# ------------------------------------------------------------------------- merge several inputs into one hierarchy
+
+def normaliseUrl(url):
+    """key under which variants of the same url are merged: scheme and host lower-cased, default port and empty path removed
+    """
+
+    url = url.strip()
+    try:
+        prts = urlsplit(url)
+    except ValueError:
+        return url
+    if not prts.netloc: return url                                                 # place:, javascript:, data: etc. as they are
+    netloc = prts.netloc.lower()
+    if (prts.scheme.lower(), netloc.rpartition(':')[2]) in (('http','80'), ('https','443')): netloc = netloc.rpartition(':')[0]
+    return urlunsplit((prts.scheme.lower(), netloc, prts.path or '/', prts.query, prts.fragment))
+
+
+class BookmarkStore:
+    """on-disk (sqlite) index of bookmarks keyed by normalised url, into which the bookmarks of many inputs are merged:
+       the earliest add date, the latest visit and modification, and every folder each url was placed in (by input)
+    """
+
+    batchSize = 10000
+
+    def __init__(self, indexFile):
+        self.conn  = sqlite3.connect(indexFile)
+        self.conn.executescript("""
+            PRAGMA journal_mode=OFF;
+            PRAGMA synchronous=OFF;
+            CREATE TABLE IF NOT EXISTS bookmarks  (urlKey TEXT PRIMARY KEY, url TEXT, name TEXT, addDate REAL, lastVisited REAL, lastModified REAL,
+                                                   iconUri TEXT, icon TEXT, lastCharset TEXT, seen INTEGER) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS placements (urlKey TEXT, folder TEXT, lastInput INTEGER, PRIMARY KEY (urlKey, folder)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS inputs     (seq INTEGER PRIMARY KEY, file TEXT);""")
+        self.batch = []
+        self.seq   = None
+
+    def addInput(self, inFile):
+        """start collecting the bookmarks of the next input, later inputs' placements win
+        """
+
+        self.flush()
+        self.seq = self.conn.execute("INSERT INTO inputs(file) VALUES (?)", (str(inFile),)).lastrowid
+
+    def add(self, fldrPath, name, href, add_date=None, last_visited=None, last_modified=None, icon_uri=None, icon=None, last_charset=None, date_scaling=1):
+        if not href: return                                                        # e.g. separators, nothing to merge
+        toSecs = lambda d: int(d)/date_scaling if d else None
+        folder = Path(fldrPath).as_posix() if fldrPath else '.'
+        self.batch.append((normaliseUrl(href), href, name, toSecs(add_date), toSecs(last_visited), toSecs(last_modified), icon_uri, icon, last_charset, folder, self.seq))
+        if len(self.batch)>=self.batchSize: self.flush()
+
+    def flush(self):
+        if not self.batch: return
+        self.conn.executemany("""
+            INSERT INTO bookmarks VALUES (?,?,?,?,?,?,?,?,?,1)
+                ON CONFLICT(urlKey) DO UPDATE SET
+                   addDate      = min(coalesce(addDate, excluded.addDate), coalesce(excluded.addDate, addDate)),
+                   lastVisited  = max(coalesce(lastVisited, excluded.lastVisited), coalesce(excluded.lastVisited, lastVisited)),
+                   lastModified = max(coalesce(lastModified, excluded.lastModified), coalesce(excluded.lastModified, lastModified)),
+                   iconUri      = coalesce(excluded.iconUri, iconUri),
+                   icon         = coalesce(excluded.icon, icon),
+                   lastCharset  = coalesce(excluded.lastCharset, lastCharset),
+                   seen         = seen+1""", [b[:9] for b in self.batch])
+        self.conn.executemany("""
+            INSERT INTO placements VALUES (?,?,?)
+                ON CONFLICT(urlKey, folder) DO UPDATE SET lastInput=max(lastInput, excluded.lastInput)""", [(b[0], b[9], b[10]) for b in self.batch])
+        self.conn.commit()
+        self.batch = []
+
+    def rows(self):
+        """the merged bookmarks, each in the folder it was last placed in, ordered by folder (depth first) and date added
+        """
+
+        self.flush()
+        yield from self.conn.execute("""
+            SELECT p.folder, b.name, b.url, b.addDate, b.lastVisited, b.lastModified, b.iconUri, b.icon, b.lastCharset
+              FROM bookmarks b
+              JOIN placements p ON p.urlKey=b.urlKey
+             WHERE p.folder=(SELECT q.folder FROM placements q WHERE q.urlKey=b.urlKey ORDER BY q.lastInput DESC, q.folder LIMIT 1)
+          ORDER BY p.folder, b.addDate""")
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def mergeFiles(inFiles, rootWriteFldr, outFmt, indexFile=None):
+    """merge the bookmarks of all inFiles, of any format, by normalised url into one deduplicated hierarchy inside rootWriteFldr
+       (or printed to stdout). The merge index is kept in indexFile if given, so later inputs can be merged into it too.
+    """
+    global bookmarkStore
+
+    tmpDir = None if indexFile else tempfile.TemporaryDirectory()
+    store  = BookmarkStore(indexFile or os.path.join(tmpDir.name, 'merge.sqlite'))
+    try:
+        for inFile in inFiles:                                                     # collect, in the order given (e.g. oldest export first)
+            store.addInput(inFile)
+            bookmarkStore = store
+            try:
+                traverseFile(inFile, Path('.'), outFmt)
+            except Exception as e:                                                 # like a batch, one bad input does not stop the merge
+                print(f"ERROR: {inFile}: {type(e).__name__}: {e} (bookmarks read before the error are kept)", file=sys.stderr)
+                if stats: stats.count('failed')
+            finally:
+                bookmarkStore = None
+        store.flush()
+        print("merged", len(inFiles), "files,", *store.conn.execute("SELECT count(*), sum(seen) FROM bookmarks").fetchone(), "urls, entries", file=sys.stderr)
+
+        for k in convertCounts: convertCounts[k] = 0
+        openFileWriter(rootWriteFldr)
+        try:
+            prevPrts, fldrPaths = (), [rootWriteFldr]                              # folder path at each depth of the current branch
+            for (folder, name, url, addDate, lastVisited, lastModified, iconUri, icon, lastCharset) in store.rows():
+                prts   = tuple(p for p in folder.split('/') if p not in ('', '.'))
+                common = 0
+                while common<min(len(prts), len(prevPrts)) and prts[common]==prevPrts[common]: common += 1
+                del fldrPaths[common+1:]
+                for depth in range(common, len(prts)): fldrPaths.append(makeBookmarkFolderDir(depth+1, prts[depth], fldrPath=fldrPaths[depth]))
+                prevPrts = prts
+                outFile, fileDate = makeBookmarkFile(len(prts)+1, name, url, outFmt, add_date=addDate, last_visited=lastVisited, last_modified=lastModified,
+                                                     icon_uri=iconUri, icon=icon, last_charset=lastCharset, fldrPath=fldrPaths[-1])
+                closeUrlFile(outFile, fileDate)
+        finally:
+            closeFileWriter()
+    finally:
+        store.close()
+        if tmpDir: tmpDir.cleanup()
+    return dict(convertCounts)
+
+# ------------------------------------------------------------------------- export into one file
+
+def exportFiles(inFiles, exportFile, merge=False, indexFile=None):
+    """export the bookmarks of inFiles, one after the other (or merged, see mergeFiles), into one file
+    """
+    global exporter
+
+    exporter = BookmarkExporter(exportFile)
+    try:
+        if merge:
+            return mergeFiles(inFiles, Path('.'), '.org', indexFile=indexFile)
+        for k in convertCounts: convertCounts[k] = 0
+        for inFile in inFiles: traverseFile(inFile, Path('.'), '.org')
+        return dict(convertCounts)
+    finally:
+        exporter.close()
+        exporter = None
+
+# ------------------------------------------------------------------------- reverse: a file hierarchy back into one bookmarks file
+
+placesRoots = {'menu':   ('menu________', 'bookmarksMenuFolder',    'Bookmarks Menu',    None),                  # top folder name: json guid, root, title, html attribute
+               'toolbar':('toolbar_____', 'toolbarFolder',          'Bookmarks Toolbar', 'PERSONAL_TOOLBAR_FOLDER'),
+               'unfiled':('unfiled_____', 'unfiledBookmarksFolder', 'Other Bookmarks',   'UNFILED_BOOKMARKS_FOLDER'),
+               'mobile': ('mobile______', 'mobileFolder',           'Mobile Bookmarks',  None)}
+placesRootNames = {'menu':'menu', 'Bookmarks_Menu':'menu', 'toolbar':'toolbar', 'Bookmarks_Toolbar':'toolbar',       # as the json and html conversions name them
+                   'unfiled':'unfiled', 'Other_Bookmarks':'unfiled', 'mobile':'mobile', 'Mobile_Bookmarks':'mobile'}
+
+
+def isoDateTimeToUnixEpoch(isoDateTime):
+    """seconds since the epoch of a (local) iso date time as unixEpochToIsoDateTime writes them, None if it isn't one
+    """
+    try:
+        return int(dt.datetime.fromisoformat(isoDateTime).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def iconDataUri(iconFile):
+    """an icon of the IconStore inlined again as a data: uri (None if it is missing)
+    """
+    mime = {ext:mime for mime, ext in reversed(IconStore.mimeExts.items())}.get(Path(iconFile).suffix, 'application/octet-stream')
+    try:
+        with open(iconFile, 'rb') as f: return f"data:{mime};base64,{base64.b64encode(f.read()).decode('ascii')}"
+    except OSError:
+        return None
+
+
+def readBookmarkFile(urlFile, rootFldr):
+    """the bookmark in a url file: title, url, and dates in seconds (DATE_ADDED, or the mtime closeUrlFile set) ..
+    """
+    fields   = get_url_fields(urlFile)
+    mtime    = os.path.getmtime(urlFile)
+    icon     = fields.get('ICON')
+    if icon and icon.startswith(IconStore.fldrName+'/'): icon = iconDataUri(os.path.join(rootFldr, icon))
+    return {'path':         urlFile,
+            'title':        fields['TITLE'],
+            'url':          fields['URL'] if fields['URL'] not in (None, 'None') else '',  # (places folders without children are written as URL=None)
+            'addDate':      isoDateTimeToUnixEpoch(fields.get('DATE_ADDED')) if fields.get('DATE_ADDED') else int(mtime),
+            'lastModified': isoDateTimeToUnixEpoch(fields.get('DATE_MODIFIED')),
+            'lastVisited':  isoDateTimeToUnixEpoch(fields.get('DATE_VISITED')),
+            'iconUri':      fields.get('ICON_URI'),
+            'icon':         icon,
+            'charset':      fields.get('LAST_CHARSET'),
+            'description':  fields.get('DESCRIPTION')}
+
+
+def hierarchyEvents(fldr, rootFldr, pool, entries=None):
+    """depth first ('folder', name, path, mtime) .. ('end',) and ('bookmark', fields) events of a folder hierarchy, sub-folders
+       (by name) before the bookmarks (by date). The url files of each folder are read on the pool, only the folders on the
+       current path are held, not the tree.  entries: the folder's os.DirEntry list if already scanned
+    """
+    if entries is None:
+        with os.scandir(fldr) as it: entries = sorted(it, key=lambda e: e.name)
+    for e in entries:
+        if e.is_dir(follow_symlinks=False) and not e.name.startswith('.') and not (fldr==rootFldr and e.name==IconStore.fldrName):
+            yield ('folder', e.name.replace('_', ' '), e.path, int(e.stat().st_mtime))
+            yield from hierarchyEvents(e.path, rootFldr, pool)
+            yield ('end',)
+    urlFiles  = [e.path for e in entries if os.path.splitext(e.name)[1].lower() in indexedExts and e.is_file()]
+    bookmarks = []
+    for urlFile, bkmk in zip(urlFiles, pool.map(lambda f: readBookmarkFile(f, rootFldr), urlFiles)):
+        if bkmk['url']: bookmarks.append(bkmk)
+        else:
+            print("skipped (no url)", urlFile, file=sys.stderr)
+            if stats: stats.count('skipped')
+    for bkmk in sorted(bookmarks, key=lambda b: (b['addDate'], b['title'])): yield ('bookmark', bkmk)
+
+
+def placesTop(rootFldr):
+    """(folder, its sorted entries) of the top of the hierarchy: rootFldr, or the folder a places.sqlite conversion wraps
+       its roots in (root/subroot/{menu,toolbar ..}): single folders are unwrapped while that leads to places roots
+    """
+    with os.scandir(rootFldr) as it: entries = sorted(it, key=lambda e: e.name)
+    fldr, top = rootFldr, entries
+    while not any(e.name in placesRootNames for e in top):
+        fldrs = [e for e in top if not e.name.startswith('.') and not (fldr==rootFldr and e.name==IconStore.fldrName)]
+        if len(fldrs)!=1 or not fldrs[0].is_dir(follow_symlinks=False): return rootFldr, entries
+        fldr = fldrs[0].path
+        with os.scandir(fldr) as it: top = sorted(it, key=lambda e: e.name)
+    return fldr, top
+
+
+def rootEvents(rootFldr, pool):
+    """the events of the whole hierarchy, as (root or None, events) per places root: top folders named like the
+       places roots (menu, Bookmarks_Toolbar ..) are those roots, everything else at the top goes into the menu
+    """
+    topFldr, entries = placesTop(rootFldr)
+    roots = {placesRootNames[e.name]: e for e in entries if e.name in placesRootNames and e.is_dir(follow_symlinks=False)}
+    other = [e for e in entries if not (e.name in placesRootNames and e.is_dir(follow_symlinks=False))]
+    def menuEvents():
+        if 'menu' in roots: yield from hierarchyEvents(roots['menu'].path, rootFldr, pool)
+        yield from hierarchyEvents(topFldr, rootFldr, pool, entries=other)
+    yield 'menu', menuEvents()
+    for root in ('toolbar', 'unfiled', 'mobile'):
+        if root in roots: yield root, hierarchyEvents(roots[root].path, rootFldr, pool)
+
+
+def writeNetscapeHtml(outFile, rootFldr, pool):
+    """the hierarchy as a netscape bookmarks html file, as firefox exports it: the menu at the top, the toolbar and
+       other bookmarks as folders marked as such
+    """
+    outFile.write('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<!-- This is an automatically generated file.\n     It will be read and overwritten.\n     DO NOT EDIT! -->\n'
+                  '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks Menu</H1>\n\n<DL><p>\n')
+    for root, events in rootEvents(rootFldr, pool):
+        ind = '    '
+        if root!='menu':
+            guid, rootName, title, attr = placesRoots[root]
+            mtime = int(os.path.getmtime(rootFldr))
+            attrs = f' {attr}="true"' if attr else ''
+            outFile.write(f'{ind}<DT><H3 ADD_DATE="{mtime}" LAST_MODIFIED="{mtime}"{attrs}>{title}</H3>\n{ind}<DL><p>\n')
+            ind += '    '
+        for e in events:
+            if e[0]=='folder':
+                outFile.write(f'{ind}<DT><H3 ADD_DATE="{e[3]}" LAST_MODIFIED="{e[3]}">{escape(e[1], quote=False)}</H3>\n{ind}<DL><p>\n')
+                ind += '    '
+                convertCounts['folders'] += 1
+            elif e[0]=='end':
+                ind = ind[:-4]
+                outFile.write(f'{ind}</DL><p>\n')
+            else:
+                b     = e[1]
+                attrs = f' ADD_DATE="{b["addDate"]}"'
+                if b['lastModified'] is not None: attrs += f' LAST_MODIFIED="{b["lastModified"]}"'
+                if b['lastVisited']  is not None: attrs += f' LAST_VISIT="{b["lastVisited"]}"'
+                if b['iconUri']:                  attrs += f' ICON_URI="{escape(b["iconUri"])}"'
+                if b['icon']:                     attrs += f' ICON="{escape(b["icon"])}"'
+                if b['charset']:                  attrs += f' LAST_CHARSET="{escape(b["charset"])}"'
+                outFile.write(f'{ind}<DT><A HREF="{escape(b["url"])}"{attrs}>{escape(b["title"], quote=False)}</A>\n')
+                if b['description']: outFile.write(f'<DD>{escape(b["description"], quote=False)}\n')        # (at the line start, as firefox writes it and cleanupLine expects)
+                convertCounts['bookmarks'] += 1
+        if root!='menu': outFile.write('    </DL><p>\n')
+    outFile.write('</DL>\n')
+
+
+def writePlacesJson(outFile, rootFldr, pool):
+    """the hierarchy as a firefox places json backup (bookmarks-*.json), written as it is walked: each container is opened,
+       its children streamed, then closed. guids are derived from the file paths, so a re-run gives the same file
+    """
+    ids   = iter(range(1, 1<<62))
+    guid  = lambda path: base64.urlsafe_b64encode(hashlib.sha1(os.fsencode(path)).digest()[:9]).decode('ascii')
+    usecs = lambda secs: None if secs is None else secs*1000000
+    def node(fields):                                                              # a node's fields, its } left open for the children
+        return json.dumps({k:v for k,v in fields.items() if v is not None}, ensure_ascii=False)[:-1]
+
+    mtime = usecs(int(os.path.getmtime(rootFldr)))
+    outFile.write(node({'guid':'root________', 'title':'', 'index':0, 'dateAdded':mtime, 'lastModified':mtime, 'id':next(ids),
+                        'typeCode':2, 'type':'text/x-moz-place-container', 'root':'placesRoot'}) + ', "children": [')
+    for rootIndex, (root, events) in enumerate(rootEvents(rootFldr, pool)):
+        rootGuid, rootName, title, attr = placesRoots[root]
+        outFile.write((', ' if rootIndex else '') + node({'guid':rootGuid, 'title':root, 'index':rootIndex, 'dateAdded':mtime, 'lastModified':mtime,
+                      'id':next(ids), 'typeCode':2, 'type':'text/x-moz-place-container', 'root':rootName}) + ', "children": [')
+        index = [0]                                                                # per open container: the index of its next child
+        for e in events:
+            if e[0]=='end':
+                index.pop()
+                outFile.write(']}')
+                continue
+            if index[-1]: outFile.write(', ')
+            if e[0]=='folder':
+                outFile.write(node({'guid':guid(e[2]), 'title':e[1], 'index':index[-1], 'dateAdded':usecs(e[3]), 'lastModified':usecs(e[3]),
+                                    'id':next(ids), 'typeCode':2, 'type':'text/x-moz-place-container'}) + ', "children": [')
+                index[-1] += 1
+                index.append(0)
+                convertCounts['folders'] += 1
+            else:
+                b = e[1]
+                outFile.write(node({'guid':guid(b['path']), 'title':b['title'], 'index':index[-1], 'dateAdded':usecs(b['addDate']),
+                                    'lastModified':usecs(b['lastModified'] if b['lastModified'] is not None else b['addDate']), 'id':next(ids),
+                                    'typeCode':1, 'charset':b['charset'], 'iconUri':b['iconUri'], 'type':'text/x-moz-place', 'uri':b['url'],
+                                    'annos':b['description'] and [{'name':'bookmarkProperties/description', 'flags':0, 'expires':4, 'value':b['description']}]}) + '}')
+                index[-1] += 1
+                convertCounts['bookmarks'] += 1
+        outFile.write(']}')
+    outFile.write(']}\n')
+
+
+def reverseConvert(rootFldr, outFile, jobs=8):
+    """write a hierarchy of url files (.url, .webloc, .html, .desktop, as bkmksConvert.py makes them) back into one netscape
+       bookmarks html (.html, - for stdout) or firefox places json (.json) file
+    """
+    fmt = Path(outFile).suffix.lower() if outFile!='-' else '.html'
+    if fmt not in ('.html', '.json'): raise ValueError(f"unsupported reverse output {fmt}, use .html or .json")
+    if not os.path.isdir(rootFldr):   raise ValueError(f"{rootFldr} is not a folder")
+
+    for k in convertCounts: convertCounts[k] = 0
+    out = sys.stdout if outFile=='-' else open(outFile, 'w', encoding='utf-8', buffering=1<<20)
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            if fmt=='.json': writePlacesJson(out, rootFldr, pool)
+            else:            writeNetscapeHtml(out, rootFldr, pool)
+    finally:
+        if out is not sys.stdout: out.close()
+        else:                     out.flush()
+    print(f"reversed {convertCounts['bookmarks']} bookmarks, {convertCounts['folders']} folders into {outFile}", file=sys.stderr)
+    return dict(convertCounts)
+
+# ------------------------------------------------------------------------------ main
+def makeArgParser():
+    """the command line arguments, (also used by bkmksBench.py to set up args)
+    """
 
     descrip = '''
-     bookmarks.[html|json|slqlite] - an input file containing bookmarks/favorites in one of these formats
+     bookmarks.[html|json|jsonlz4|slqlite] - an input file containing bookmarks/favorites in one of these formats
 
      rootWriteFldrAreaPath - a path to a directory inside which the hierarchy of bookmarks will be created as subfolders and files
          if omitted, the bookmark data will be printed to stdout in org-mode format (no files or folders will be created)
@@ -366,32 +1890,67 @@ if __name__ == "__main__":
        ./bmksConvert.py bmArchive/html/bookmarks_20070817.html
        ./bmksConvert.py bmArchive/json/bookmarks_20080907.json      ./testArea/json
        ./bmksConvert.py bmArchive/sqlite/firefox_places_2021.sqlite ./testArea/sqlite
+       ./bmksConvert.py bmArchive                                   ./testArea/archive   (each file into its own sub-folder)
+       ./bmksConvert.py ./testArea/sqlite -r bookmarks.html                             (and back again, or -r places.json)
     '''
 
     parser = argparse.ArgumentParser(
         prog='bkmksConvert.py',
-        description='convert file [.sqlite|.html|.json] containing bookmarks into file hierarchy of single-bookmark files [.html|.url|.webloc|..]',
+        description='convert file [.sqlite|.html|.json|.jsonlz4] containing bookmarks into file hierarchy of single-bookmark files [.html|.url|.webloc|..]',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog=descrip)
 
-    parser.add_argument('file',                                   type=str, help="file containing urls")                                                 # Add required positional argument
+    parser.add_argument('file',                                   type=str, help="file containing urls, or a folder or glob of such files to convert in a batch")                                                 # Add required positional argument
     parser.add_argument('writeFolder', nargs='?', default=None,   type=str, help="path to folder inside which (many!) folder & files hierarchy will be created") # Add optional positional
     parser.add_argument('-v',  '--verbose',  action='store_true')     # be verbose
+    parser.add_argument('-s',  '--stream',   action='store_true', help='stream the input instead of parsing it whole into memory (html, json)')
+    parser.add_argument('-l',  '--live',     action='store_true', help='read a places.sqlite in use by a running browser (snapshot, or immutable if locked)')
+    parser.add_argument('-j',  '--jobs',     type=int, default=1,  help='number of threads writing bookmark files (default 1, i.e. serial)')
+    parser.add_argument('-i',  '--incremental', action='store_true', help='only write bookmarks that are new or changed since the last run into writeFolder')
+    parser.add_argument(       '--prune',    action='store_true', help='with --incremental, delete files of bookmarks no longer in the input')
+    parser.add_argument(       '--icons',    action='store_true', help='store each distinct favicon once in writeFolder/icons/<sha256>.<ext> and refer to it from the bookmark files')
+    parser.add_argument('-e',  '--export',   type=str, default=None, help='write all bookmarks into this one file instead, as org-mode (.org, - for stdout), markdown (.md) or json lines (.jsonl)')
+    parser.add_argument('-a',  '--archive',  type=str, default=None, help='write the hierarchy into this .zip/.tar(.gz|.bz2|.xz|.zst) archive instead, inside writeFolder (default: the archive name)')
+    parser.add_argument(       '--index',    nargs='?', const=defaultIndexFile, default=None, help=f'index the written files for openUrlFile.py search, in this index (default {defaultIndexFile})')
+    parser.add_argument(       '--parseCache', nargs='?', const=defaultParseCacheFile, default=None, help=f'cache the parsed inputs, so that converting one again (into any format) skips parsing it, in this file (default {defaultParseCacheFile})')
+    parser.add_argument(       '--parseCacheMB', type=int, default=1024, help='with --parseCache, evict the least recently used inputs beyond this size (default 1024)')
+    parser.add_argument('-m',  '--merge',    action='store_true', help='merge all input files into one hierarchy, deduplicated by url')
+    parser.add_argument(       '--mergeIndex', type=str, default=None, help='with --merge, keep the merge index in this (sqlite) file, and merge into it if it exists')
+    parser.add_argument(       '--stats',    nargs='?', const='-', default=None, help='show progress, and report counts and the time spent in each stage as json, on stderr or into this file')
+    parser.add_argument(       '--profile',  type=str, default=None, help='profile the conversion with cProfile, dump the stats into this file (view with python -m pstats)')
+    parser.add_argument('-p',  '--procs',    type=int, default=None, help='number of processes converting a batch of files (default: all cores)')
 
     exclsve_grp = parser.add_mutually_exclusive_group(required=True)  # Create mutually exclusive group
     exclsve_grp.add_argument('-ow', '--webloc',   action='store_true', help='write url files in .webloc format')
     exclsve_grp.add_argument('-oh', '--html',     action='store_true', help='write url files in .html format')
     exclsve_grp.add_argument('-ou', '--url',      action='store_true', help='write url files in .url format')
     exclsve_grp.add_argument('-oo', '--orgmode',  action='store_true', help='write urls in one  .org format file')
+    exclsve_grp.add_argument('-r',  '--reverse',  type=str, default=None, help='the other way: write the hierarchy of url files in the folder file back into this netscape bookmarks .html (- for stdout) or places .json file')
+
+    return parser
 
+
+if __name__ == "__main__":
+
+    parser = makeArgParser()
     args = parser.parse_args()                                       # print(args.filename, args.verbose)
 
 
     if args.verbose: print("DEBUG: parsed args", args)
     if args.verbose: print("DEBUG: determine file or files")
 
-    inFile        = Path(vars(args)['file'])
+    if args.reverse:                                                  # a hierarchy of url files back into one bookmarks file
+        if not os.path.isdir(vars(args)['file']):
+            print(f"--reverse reads a folder of url files, {vars(args)['file']} isn't one", file=sys.stderr)
+            sys.exit(1)
+        run = lambda: reverseConvert(vars(args)['file'], args.reverse, jobs=args.jobs if args.jobs>1 else 8)
+        runInstrumented(run, statsFile=args.stats, profileFile=args.profile, input=vars(args)['file'], output=args.reverse)
+        sys.exit(0)
+
+    inFiles       = findInputFiles(vars(args)['file'])
+    isBatch       = len(inFiles)!=1 or not os.path.isfile(vars(args)['file'])
     rootWriteFldr = vars(args)['writeFolder']
+    if args.archive and not rootWriteFldr: rootWriteFldr = Path(args.archive).name.split('.')[0]  # the folder inside the archive
     if not rootWriteFldr: print("DEBUG: no write folder given, output to stdout in org-mode format")
 
     if not rootWriteFldr: outFmt = ".org"                             # default, implies to stdout
@@ -401,16 +1960,18 @@ if __name__ == "__main__":
     else:                 outFmt = ".org"                             # default, implies to stdout
     if args.verbose: print("DEBUG: output files format =", outFmt)
 
-    if  rootWriteFldr: os.makedirs(rootWriteFldr, exist_ok=True)
-
-    if   inFile.suffix=='.sqlite':
-        pTreeDict = readSqliteBookmarks(inFile)
-        dftSqliteDict(rootWriteFldr, pTreeDict[0], pTreeDict, outFmt)
-    elif inFile.suffix=='.json':
-        pTreeObj = readJsonBookmarks(inFile)
-        dftJson(rootWriteFldr, pTreeObj, outFmt)
-    elif inFile.suffix=='.html':
-        pTreeObj = readHtmlBookmarks(inFile)
-        dftHtml(rootWriteFldr, pTreeObj.getroot(), outFmt)
-
-
+    if not inFiles:
+        print(f"no bookmark files found in {vars(args)['file']}", file=sys.stderr)
+        sys.exit(1)
+    elif args.archive and (args.incremental or (isBatch and not args.merge)):
+        print("--archive writes one new archive, it can't be used with --incremental, or for a batch of files unless merged (-m)", file=sys.stderr)
+        sys.exit(1)
+    elif isBatch and not rootWriteFldr and not (args.export or args.merge):
+        print("a writeFolder is needed to convert a batch of files", file=sys.stderr)
+        sys.exit(1)
+
+    if   args.export: run = lambda: exportFiles(inFiles, args.export, merge=args.merge, indexFile=args.mergeIndex)
+    elif args.merge:  run = lambda: mergeFiles(inFiles, rootWriteFldr, outFmt, indexFile=args.mergeIndex)
+    elif isBatch:     run = lambda: sys.exit(0 if batchConvert(inFiles, rootWriteFldr, outFmt, procs=args.procs) else 1)
+    else:             run = lambda: convertFile(inFiles[0], rootWriteFldr, outFmt)
+    runInstrumented(run, statsFile=args.stats, profileFile=args.profile, input=vars(args)['file'], writeFolder=rootWriteFldr and str(rootWriteFldr), outFmt=outFmt)
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+#
+# full-text (sqlite FTS5) index of the bookmark files in converted hierarchies
+#
+# Filled by bkmksConvert.py (--index) as it writes the files, or by openUrlFile.py (index) from
+# an existing tree, and searched by openUrlFile.py (search). Each indexed bookmark file is one row
+# of title, url, folder (path inside its tree), dates, and the absolute path of the file itself,
+# so the hits can be opened as any other bookmark file.
+#
+
+import os
+import sqlite3
+from pathlib import Path
+
+defaultIndexFile = f"{os.path.expanduser('~')}/history/bookmarksIndex.sqlite"   # next to openUrlFile.py's browse log
+
+indexSchema = """
+    CREATE TABLE IF NOT EXISTS bookmarks (id INTEGER PRIMARY KEY, path TEXT UNIQUE, title TEXT, url TEXT, folder TEXT, added TEXT, visited TEXT);
+    CREATE VIRTUAL TABLE IF NOT EXISTS bookmarksFts USING fts5(title, url, folder, content='bookmarks', content_rowid='id');
+    CREATE TRIGGER IF NOT EXISTS bookmarksInsert AFTER INSERT ON bookmarks BEGIN
+        INSERT INTO bookmarksFts(rowid, title, url, folder) VALUES (new.id, new.title, new.url, new.folder);
+    END;
+    CREATE TRIGGER IF NOT EXISTS bookmarksDelete AFTER DELETE ON bookmarks BEGIN
+        INSERT INTO bookmarksFts(bookmarksFts, rowid, title, url, folder) VALUES ('delete', old.id, old.title, old.url, old.folder);
+    END;
+    CREATE TRIGGER IF NOT EXISTS bookmarksUpdate AFTER UPDATE ON bookmarks BEGIN
+        INSERT INTO bookmarksFts(bookmarksFts, rowid, title, url, folder) VALUES ('delete', old.id, old.title, old.url, old.folder);
+        INSERT INTO bookmarksFts(rowid, title, url, folder) VALUES (new.id, new.title, new.url, new.folder);
+    END;"""
+
+
+class BookmarkIndex:
+    """the bookmarks table (one row per bookmark file, unique by path) and its external content FTS5 table, kept in step by triggers.
+       Rows are added in batches, a file written again (same path) replaces its row.
+    """
+
+    batchSize = 10000
+
+    def __init__(self, indexFile=defaultIndexFile, root=None):
+        os.makedirs(os.path.dirname(os.path.abspath(indexFile)), exist_ok=True)
+        self.conn  = sqlite3.connect(indexFile, timeout=60)                     # (batch conversions index from several processes)
+        try:
+            self.conn.executescript(indexSchema)
+        except sqlite3.OperationalError as e:
+            raise RuntimeError(f"cannot create the bookmark index {indexFile}, this python's sqlite may lack FTS5 ({e})") from e
+        self.batch = []
+        self.root  = root                                                          # (optional) the tree being indexed, the folders of added files are relative to it
+
+    def removeTree(self, root):
+        """forget all the bookmarks under root, before (re)indexing it
+        """
+
+        self.flush()
+        root = os.path.abspath(root)
+        self.conn.execute("DELETE FROM bookmarks WHERE path>? AND path<?", (root+os.sep, root+chr(ord(os.sep)+1)))  # path index range scan
+        self.conn.commit()
+
+    def add(self, path, title, url, folder=None, added=None, visited=None):
+        if folder is None: folder = os.path.relpath(os.path.dirname(path), self.root) if self.root else ''
+        if folder=='.':    folder = ''
+        self.batch.append((os.path.abspath(path), title, url, Path(folder).as_posix() if folder else '', added, visited))
+        if len(self.batch)>=self.batchSize: self.flush()
+
+    def flush(self):
+        if not self.batch: return
+        self.conn.executemany("""
+            INSERT INTO bookmarks(path, title, url, folder, added, visited) VALUES (?,?,?,?,?,?)
+                ON CONFLICT(path) DO UPDATE SET title=excluded.title, url=excluded.url, folder=excluded.folder,
+                                                added=excluded.added, visited=excluded.visited""", self.batch)
+        self.conn.commit()
+        self.batch = []
+
+    def search(self, query, limit=20):
+        """the best matching bookmarks as (path, title, url, folder, added, visited), title matches rank above url and folder ones.
+           query is in FTS5 syntax (words, "phrases", prefix*, AND/OR/NOT, title:word ..), if it isn't valid FTS5 its words are searched for as they are
+        """
+
+        self.flush()
+        sqry = """SELECT b.path, b.title, b.url, b.folder, b.added, b.visited
+                    FROM bookmarksFts
+                    JOIN bookmarks b ON b.id=bookmarksFts.rowid
+                   WHERE bookmarksFts MATCH ?
+                ORDER BY bm25(bookmarksFts, 10.0, 4.0, 2.0)
+                   LIMIT ?"""
+        try:
+            return self.conn.execute(sqry, (query, limit)).fetchall()
+        except sqlite3.OperationalError:                                           # e.g. c++, or a url: quote each word
+            return self.conn.execute(sqry, (" ".join('"'+w.replace('"', '""')+'"' for w in query.split()), limit)).fetchall()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
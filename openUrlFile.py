@@ -21,57 +21,426 @@ import configparser                               # for .url, .desktop
 import plistlib                                   # for .webloc xml
 import subprocess
 import datetime
+import time
+import html
+import html.entities
+import json
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from glob import glob
 from os.path import expanduser
+from pathlib import Path
+from bkmksIndex import BookmarkIndex, defaultIndexFile
+from bkmksCheck import CheckCache, checkUrls, isAlive, defaultCheckFile
 
 dt             = str(datetime.datetime.now())
 logDir         = f"{expanduser('~')}/history"                         # folder to keep history log of urls opened
 defaultBrowser = ['xdg-open', 'firefox', 'chromium', 'konqueror'][1]  # could add command line options, such as --new-tab [url]?
 stderrFile     = f"{logDir}/openUrlFileLast.stderr"
 browseLogFile  = f"{logDir}/openUrlFileBrowseLog_{dt[:7]}.log"        # logfile for each month
+args           = argparse.Namespace(verbose=False)                   # the parsed command line, (these defaults when imported, e.g. by bkmksConvert.py)
+
+
+headSize = 8192                                                   # the lightweight readers only look at the start of a file
+
+headPatterns = {                                                  # url of each format, found in the first headSize bytes
+    '.url':     re.compile(rb'^[ \t]*URL[ \t]*=[ \t]*(?P<url>\S[^\r\n]*?)[ \t]*\r?$', re.M|re.I),
+    '.desktop': re.compile(rb'^[ \t]*URL(?:\[[^\]\r\n]*\])?[ \t]*=[ \t]*(?P<url>\S[^\r\n]*?)[ \t]*\r?$', re.M|re.I),  # e.g. url[$e]=https://ww...
+    '.webloc':  re.compile(rb'<key>URL</key>\s*<string>(?P<url>[^<]*)</string>'),
+    '.html':    re.compile(rb'http-equiv=["\']?refresh["\']?\s+content=(?P<q>["\'])\d*;\s*url=(?P<url>[^\r\n]+?)(?P=q)', re.I),  # (may span lines) up to the quote opening content=
+}
+
+
+entityRe = re.compile(r'&(#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);')   # only complete references, ending in ;
+
+
+def unescape_url(url):
+    """decode the character references (&amp; &#38; ..) of a url from xml or html. bkmksConvert.py writes hrefs as they are, so a
+       bare & of a query string (?lang=en&region=us) stays as it is, where html.unescape would make &reg into ®
+    """
+    def ref(m):
+        name = m.group(1)
+        if name[0]=='#': return html.unescape(m.group(0))
+        return html.entities.html5.get(name+';', m.group(0))
+    return entityRe.sub(ref, url) if '&' in url else url
+
+
+def head_url(file_path, ext=None, head=None):
+    """the url of a url file from a regex over its first headSize bytes (head, if already read), None if it isn't there (binary plist, a long header ..)
+    """
+    if ext is None: ext = os.path.splitext(file_path)[1].lower()
+    pattern = headPatterns.get(ext)
+    if pattern is None: return None
+    if head is None:
+        with open(file_path, 'rb') as f: head = f.read(headSize)
+    mtch = pattern.search(head)
+    if not mtch: return None
+    url = mtch['url'].decode('utf-8', 'replace')
+    return unescape_url(url) if ext in ('.webloc', '.html') else url  # (xml and html escape the & of query strings)
 
 
 def get_url_file(file_path):
     _, ext = os.path.splitext(file_path)
     ext = ext.lower()
-    url = None
+    url = head_url(file_path, ext) if ext in headPatterns else None   # the common case, without parsing the whole file
+    if url: return url
 
     if ext=='.url':                               # check for sections, without sections, configparser doesn't work
-        config = configparser.ConfigParser()
+        config = configparser.ConfigParser(interpolation=None)
         if args.verbose:                          # for k,v in config.items(): print('config',k,v)
             print(config)
         config.read(file_path)
         url = config.get('InternetShortcut', 'URL')
 
     elif ext=='.desktop':
-        config = configparser.ConfigParser(strict=False)
+        config = configparser.ConfigParser(strict=False, interpolation=None)
         config.read(file_path)
         urlKys = [ k for k in config['Desktop Entry'] if k.upper()[:3]=='URL']  # sometimes the "URL" key has funky qualifiers, e.g. url[$e]=https://ww...
         if len(urlKys)==1: url = config.get('Desktop Entry', urlKys[0])
 
     elif ext=='.webloc':
-        with open(file_path, 'rb') as f: url = plistlib.load(f).get('URL')
+        with open(file_path, 'rb') as f: url = plistlib.load(f).get('URL')  # e.g. a binary plist
 
-    elif ext=='.html':
-        firstLine = open(fl).readline()
-        if firstLine.startswith('<html><head><meta http-equiv="refresh"'):
-            # for example: <html><head><meta http-equiv="refresh" content="0; url=https://www.ft.com/content/f9cf6d1a-0313-4c1f-aeb2-df1f64bd5d3e" /></head></html>
-            mtch = re.search(r'url=(.+)"', firstLine)                 # from url=http.....to end double-quote
-            if mtch: url = mtch.groups()[0]                           # <re.Match object; span=(0, 3), match='012'>
-            else:    url = file_path                                  # just pass the file path to the browser    (n.b. an html file with one url in it works automaticaly with firefox)
+    elif ext=='.html':                            # no meta refresh: an actual web page
+        url = file_path                           # just pass the file path to the browser    (n.b. an html file with one url in it works automaticaly with firefox)
 
     else:
         print(f'Unsupported file type: {ext}')
     return url
 
 
+indexedExts = ('.url', '.webloc', '.desktop', '.html')                   # the url files get_url_file reads
+
+descriptionRe = re.compile(rb'^DESCRIPTION:(.*?)\r?$', re.M)                # after the </plist> or </html> of bkmksConvert.py's files
+urlFileKeys = ('TITLE', 'URL', 'DATE_ADDED', 'DATE_MODIFIED', 'DATE_VISITED', 'ICON_URI', 'ICON', 'LAST_CHARSET')  # what bkmksConvert.py writes into .url files
+
+
+def get_url_fields(file_path):
+    """title, url, dates (and icon, charset) of a url file: read straight from the lines bkmksConvert.py writes into
+       .url and .webloc files, otherwise the url from get_url_file, the title from the file name and the date from its mtime
+    """
+    ext    = os.path.splitext(file_path)[1].lower()
+    fields = {}
+
+    if ext=='.url':
+        with open(file_path, encoding='utf-8', errors='replace') as f:
+            for ln in f:
+                key, sep, val = ln.rstrip('\n').partition('=')
+                if sep and key in urlFileKeys: fields.setdefault(key, val)
+                elif ln.startswith('DESCRIPTION:'): fields.setdefault('DESCRIPTION', ln[12:].strip())  # bkmksConvert.py's line for an html <DD>
+    elif ext=='.webloc':
+        with open(file_path, 'rb') as f: data = f.read()
+        try:
+            fields = {k:v for k,v in plistlib.loads(data).items() if k in ('URL', 'DATE_ADDED')}
+        except Exception:                                             # e.g. a DESCRIPTION line after the </plist>
+            fields = {k:unescape_url(v) for k,v in re.findall(r'<key>(URL|DATE_ADDED)</key>\s*<string>([^<]*)</string>', data.decode('utf-8', 'replace'))}
+    elif ext=='.html':                                                # the meta refresh of bkmksConvert.py's .html files spans several lines
+        with open(file_path, 'rb') as f: data = f.read(headSize)
+        url = head_url(file_path, ext, data)
+        if url: fields['URL'] = url
+    if ext in ('.webloc', '.html'):
+        descr = descriptionRe.search(data)
+        if descr: fields['DESCRIPTION'] = descr.group(1).decode('utf-8', 'replace').strip()
+
+    if 'URL' not in fields: fields['URL'] = get_url_file(file_path)
+    if 'TITLE' not in fields: fields['TITLE'] = os.path.splitext(os.path.basename(file_path))[0].replace('_', ' ')
+    if 'DATE_ADDED' not in fields: fields['DATE_ADDED'] = datetime.datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%dT%H:%M:%S')
+    return fields
+
+
+def index_tree(index, root):
+    """(re)index all the url files under root, returns how many
+    """
+    index.removeTree(root)
+    count = 0
+    for dirPath, dirNames, fileNames in os.walk(root):
+        dirNames[:] = [d for d in dirNames if not d.startswith('.') and not (dirPath==root and d=='icons')]  # skip bkmksConvert.py's icon store
+        folder = os.path.relpath(dirPath, root)
+        for fn in fileNames:
+            if os.path.splitext(fn)[1].lower() not in indexedExts: continue
+            try:
+                fields = get_url_fields(os.path.join(dirPath, fn))
+            except Exception as e:                                    # a broken url file doesn't stop the indexing
+                print(f"skipped {os.path.join(dirPath, fn)}: {e}", file=sys.stderr)
+                continue
+            index.add(os.path.join(dirPath, fn), fields['TITLE'], fields['URL'], '' if folder=='.' else folder, fields['DATE_ADDED'], fields.get('DATE_VISITED'))
+            count += 1
+    index.flush()
+    return count
+
+
+def scan_entries(root):
+    """the os.DirEntry of every url file under root, walked with os.scandir (its entries carry their type, and stat on windows)
+    """
+    stack = [root]
+    while stack:
+        dirPath = stack.pop()
+        try:
+            with os.scandir(dirPath) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith('.') and not (dirPath==root and entry.name=='icons'): stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in indexedExts:
+                        yield entry
+        except OSError as e:                                          # an unreadable folder doesn't stop the scan
+            print(f"skipped {dirPath}: {e}", file=sys.stderr)
+
+
+def scan_entry(entry):
+    """(path, url, mtime) of one url file, url None if it can't be read
+    """
+    try:
+        mtime = datetime.datetime.fromtimestamp(entry.stat().st_mtime).strftime('%Y-%m-%dT%H:%M:%S')
+        return entry.path, get_url_file(entry.path), mtime
+    except Exception as e:
+        print(f"skipped {entry.path}: {e}", file=sys.stderr)
+        return entry.path, None, None
+
+
+def scan_url_files(roots, workers=16, window=1024):
+    """(path, url, mtime) of all the url files under roots, in walk order. The files are read on a thread pool,
+       at most window of them in flight, so a huge tree is streamed rather than collected first
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for root in roots:
+            for entry in scan_entries(root):
+                pending.append(pool.submit(scan_entry, entry))
+                if len(pending)>=window: yield pending.popleft().result()
+        while pending: yield pending.popleft().result()
+
+
+def write_scan(rows, out=sys.stdout, fmt='tsv', batch=1000):
+    """write the scanned rows as tsv (path, url, mtime; tabs and newlines in the fields become spaces) or jsonl, returns how many
+    """
+    clean = lambda s: '' if s is None else s.replace('\t', ' ').replace('\n', ' ')
+    lines, count = [], 0
+    for path, url, mtime in rows:
+        if fmt=='jsonl': lines.append(json.dumps({'path': path, 'url': url, 'mtime': mtime}, ensure_ascii=False))
+        else:            lines.append(f"{clean(path)}\t{clean(url)}\t{clean(mtime)}")
+        count += 1
+        if len(lines)>=batch:
+            out.write("\n".join(lines)+"\n")
+            lines = []
+    if lines: out.write("\n".join(lines)+"\n")
+    out.flush()
+    return count
+
+
+
+class TokenBucket:
+    """rate limit: take(n) waits until n tokens are in the bucket, which refills at rate tokens a second up to burst
+    """
+
+    def __init__(self, rate, burst=1, full=True):
+        self.rate   = rate
+        self.burst  = max(burst, 1)
+        self.tokens = self.burst if full else 0.0
+        self.last   = time.monotonic()
+
+    def take(self, n=1):
+        n = min(n, self.burst)                                        # (a chunk bigger than the bucket waits for a full one)
+        while True:
+            now         = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now-self.last)*self.rate)
+            self.last   = now
+            if self.tokens>=n: break
+            time.sleep((n-self.tokens)/self.rate)
+        self.tokens -= n
+
+
+def log_urls(opened):
+    """append (file, url) of the opened files to the browse log, in one write
+    """
+    os.makedirs(logDir, exist_ok=True)
+    with open(browseLogFile, 'a') as blf:
+        blf.write("".join(f"DATE={dt}, URL={url}, FILE={fl}\n" for fl, url in opened))
+
+
+launchWait = 10                                                   # seconds to wait at the end for invocations that didn't wait, to report failures
+
+
+def open_urls(browser, urls, chunk=1, bucket=None, wait=True):
+    """hand the urls to the browser, chunk of them per invocation (firefox url1 url2 ..), taking a token per url from the bucket.
+       wait: each invocation has to finish (and succeed) before the next, otherwise they run on, and those that fail within launchWait
+       seconds of the last one starting are reported at the end
+    """
+    procs = []
+    os.makedirs(logDir, exist_ok=True)
+    with open(stderrFile, 'w') as errf:
+        for i in range(0, len(urls), chunk):
+            part = urls[i:i+chunk]
+            if bucket: bucket.take(len(part))
+            if wait: subprocess.run([browser, *part], check=True, stderr=errf, text=True)
+            else:    procs.append((part, subprocess.Popen([browser, *part], stderr=errf)))
+    deadline = time.monotonic() + launchWait
+    for part, proc in procs:
+        try:
+            returncode = proc.wait(timeout=max(0, deadline-time.monotonic()))
+        except subprocess.TimeoutExpired:                             # still running: it started the browser itself, not a failure
+            continue
+        if returncode!=0: print(f"{browser} failed ({returncode}) for", *part, file=sys.stderr)
+
+
+
+class UrlCollector:
+    """stands in for bkmksConvert.py's exporter, collecting the urls of a bookmarks file as it is traversed
+    """
+
+    def __init__(self): self.urls = []
+    def folder(self, depth, name): pass
+    def bookmark(self, fldrPath, name, href, *details): self.urls.append(href)
+
+
+def bookmark_urls(inFile):
+    """the urls of a bookmarks file (places.sqlite, .json, .jsonlz4, netscape .html) as read by bkmksConvert.py
+    """
+    import bkmksConvert as bc                                         # (it needs lxml, only imported for bookmarks files)
+    bc.args     = bc.makeArgParser().parse_args([inFile, '-s', '-oo'])
+    bc.exporter = collector = UrlCollector()
+    try:     bc.traverseFile(inFile, Path('.'), '.org')
+    finally: bc.exporter = None
+    return collector.urls
+
+
+def check_sources(paths, workers=16):
+    """(url, file) to check: the url files in trees or given as they are, and (url, None) for the bookmarks of bookmarks files
+    """
+    sources = []
+    for pth in paths:
+        ext = os.path.splitext(pth)[1].lower()
+        if os.path.isdir(pth):
+            sources.extend((url, path) for path, url, mtime in scan_url_files([pth], workers=workers) if url)
+        elif ext in indexedExts and (ext!='.html' or head_url(pth, ext)):  # (an .html without a meta refresh is a bookmarks file)
+            sources.append((get_url_file(pth), pth))
+        else:
+            sources.extend((url, None) for url in bookmark_urls(pth))
+    return sources
+
+
+def check_meta(result):
+    """STATUS (the http status, or the error), CHECKED and FINAL_URL (if redirected) of a check result
+    """
+    status, finalUrl, error, checked = result
+    meta = {'STATUS':  " ".join(filter(None, [status and str(status), error and f"error: {error}".replace('\n', ' ')])),  # e.g. 302 error: too many redirects
+            'CHECKED': datetime.datetime.fromtimestamp(checked).strftime('%Y-%m-%dT%H:%M:%S')}
+    if finalUrl: meta['FINAL_URL'] = finalUrl
+    return meta
+
+
+def set_ini_keys(text, section, keys, prefix):
+    """text of an .url/.desktop file with the keys set at the end of section, earlier keys starting with prefix dropped
+    """
+    nl    = '\r\n' if '\r\n' in text else '\n'
+    lines = [ln for ln in text.split(nl) if not ln.lstrip().startswith(prefix)]
+    start = next((i for i, ln in enumerate(lines) if ln.strip().lower()==f"[{section.lower()}]"), None)
+    if start is None: return None
+    end   = next((i for i in range(start+1, len(lines)) if lines[i].lstrip().startswith('[')), len(lines))
+    while end>start+1 and not lines[end-1].strip(): end -= 1       # before the blank lines ending the section
+    lines[end:end] = [f"{k}={v}" for k, v in keys.items()]
+    return nl.join(lines)
+
+
+def insert_before(text, mtch, block):
+    """insert block (whole lines) before the line of mtch, or right at it if the line has more in front of it
+    """
+    lineStart = text.rfind('\n', 0, mtch.start())+1
+    at = lineStart if not text[lineStart:mtch.start()].strip() else mtch.start()
+    return text[:at] + block + text[at:]
+
+
+def write_check_meta(file_path, result):
+    """write the check result into the url file: LINK_* keys in .url and .webloc, X-Link-* in .desktop, link-* meta tags in .html.
+       The file keeps its mtime (the bookmark's date). False if there is no place for them in the file
+    """
+    ext  = os.path.splitext(file_path)[1].lower()
+    meta = check_meta(result)
+    with open(file_path, 'rb') as f: data = f.read()
+
+    if ext=='.webloc' and data.startswith(b'bplist'):
+        plist = {k:v for k,v in plistlib.loads(data).items() if not k.startswith('LINK_')}
+        plist.update(('LINK_'+k, v) for k,v in meta.items())
+        new = plistlib.dumps(plist, fmt=plistlib.FMT_BINARY)
+    else:
+        text = data.decode('utf-8', 'surrogateescape')
+        if ext=='.url':
+            text = set_ini_keys(text, 'InternetShortcut', {'LINK_'+k: v for k,v in meta.items()}, 'LINK_')
+        elif ext=='.desktop':
+            text = set_ini_keys(text, 'Desktop Entry', {'X-Link-'+k.title().replace('_', '-'): v for k,v in meta.items()}, 'X-Link-')
+        elif ext=='.webloc':
+            text = re.sub(r'[ \t]*<key>LINK_[A-Z_]+</key>\s*<string>[^<]*</string>[ \t]*\n?', '', text)
+            mtch = list(re.finditer(r'</dict>', text))
+            block = "".join(f"    <key>LINK_{k}</key> <string>{html.escape(v, quote=False)}</string>\n" for k,v in meta.items())
+            text = insert_before(text, mtch[-1], block) if mtch else None
+        elif ext=='.html':
+            text = re.sub(r'[ \t]*<meta name="link-[a-z-]+" content="[^"]*"\s*/?>[ \t]*\n?', '', text)
+            mtch = re.search(r'</head>', text, re.I)
+            block = "".join(f'    <meta name="link-{k.lower().replace("_", "-")}" content="{html.escape(v)}" />\n' for k,v in meta.items())
+            text = insert_before(text, mtch, block) if mtch else None
+        else:
+            text = None
+        if text is None: return False
+        new = text.encode('utf-8', 'surrogateescape')
+
+    if new!=data:
+        st = os.stat(file_path)
+        with open(file_path+'.tmp', 'wb') as f: f.write(new)
+        os.replace(file_path+'.tmp', file_path)
+        os.utime(file_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return True
+
+
+def check_links(paths, cacheFile=defaultCheckFile, ttlDays=7, concurrency=64, perHost=4, timeout=10.0, deadOnly=False, writeMeta=True, workers=16):
+    """check the urls of paths (see check_sources), print status, url, final url or error, and the url file (or bookmarks file)
+       as tsv, and write the results into the url files. Returns the numbers of urls checked and dead
+    """
+    sources = [(url, file, pth) for pth in paths for url, file in check_sources([pth], workers)]
+    cache   = CheckCache(cacheFile, ttl=ttlDays*86400)
+    try:
+        results = checkUrls((url for url, file, pth in sources), cache, concurrency=concurrency, perHost=perHost, timeout=timeout)
+    finally:
+        cache.close()
+
+    dead, lines = set(), []
+    for url, file, pth in sources:
+        result = results.get(url)
+        if result is None: continue                                   # not http(s): place:, javascript:, file: ..
+        status, finalUrl, error, checked = result
+        alive = isAlive(result)
+        if not alive: dead.add(url)
+        if not (alive and deadOnly): lines.append(f"{status if status is not None else 'ERR'}\t{url}\t{finalUrl or error or ''}\t{file or pth}")
+        if writeMeta and file:
+            try:
+                write_check_meta(file, result)
+            except (OSError, ValueError) as e:                        # a broken url file doesn't stop the others
+                print(f"skipped {file}: {e}", file=sys.stderr)
+    if lines: print("\n".join(lines))
+    return len(results), len(dead)
+
 
 if __name__ == "__main__":
 
+    descrip = '''
+     index and search (sqlite FTS5) the url files of converted bookmark hierarchies:
+       openUrlFile.py index ./testArea/sqlite ./testArea/html      (re)index these trees
+       openUrlFile.py search python tutorial                        open the best 10 matches
+       openUrlFile.py search -l 'title:python AND url:github' -n 50 list them instead
+     and list the urls of whole trees (recursively, on a thread pool):
+       openUrlFile.py scan ./testArea/sqlite > urls.tsv            path, url, mtime per line
+       openUrlFile.py scan --jsonl -w 32 ./testArea/sqlite           as json lines, with 32 reader threads
+     check the links (of trees, url files, or bookmarks files), the results are written into the url files:
+       openUrlFile.py check ./testArea/sqlite                          status, url, final url or error, file
+       openUrlFile.py check --dead --ttl 30 places.sqlite             only the dead ones, recheck after 30 days
+     open a whole folder at once:
+       openUrlFile.py --batch ./testArea/sqlite/Bookmarks_Toolbar     firefox url1 .. url20, at most 5 urls a second
+       openUrlFile.py --batch --chunk 50 --rate 20 ./someFolder
+    '''
+
     parser = argparse.ArgumentParser(
         prog='openUrlFile',
         description='open url embedded in file',
-        epilog='-------- openUrlFile.py --------')
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=descrip+'-------- openUrlFile.py --------')
 
     parser.add_argument('file|folder|glob', nargs="+")                # positional argument
     parser.add_argument('-t',  '--type',      action='store_true')    # type out the file containing the url
@@ -83,8 +452,23 @@ if __name__ == "__main__":
     parser.add_argument('-bk', '--konqueror', action='store_true')    # browse with konqueror
     parser.add_argument('-bo', '--xdgopen',   action='store_true')    # browse with xdg-open - beware of infinte recursion xdg-open may decide to use this srcipt !
     parser.add_argument('-nl', '--noLog',     action='store_true')    # log (append) to given log file
+    parser.add_argument(       '--db',        default=defaultIndexFile) # the search index
+    parser.add_argument('-n',  '--limit',     type=int, default=10)    # search: number of hits
+    parser.add_argument('-w',  '--workers',   type=int, default=16)    # scan: reader threads
+    parser.add_argument(       '--jsonl',     action='store_true')    # scan: json lines instead of tsv
+    parser.add_argument(       '--checkDb',   default=defaultCheckFile) # check: the results cache
+    parser.add_argument(       '--ttl',       type=float, default=7)   # check: days a result is kept before the url is checked again
+    parser.add_argument(       '--concurrency', type=int, default=64)  # check: requests in flight
+    parser.add_argument(       '--perHost',   type=int, default=4)     # check: requests in flight to one host
+    parser.add_argument(       '--timeout',   type=float, default=10)  # check: seconds
+    parser.add_argument(       '--dead',      action='store_true')    # check: only print the dead links
+    parser.add_argument(       '--noMeta',    action='store_true')    # check: don't write the results into the url files
+    parser.add_argument(       '--batch',     action='store_true')    # open all the urls with as few browser invocations as possible
+    parser.add_argument(       '--chunk',     type=int, default=20)    # batch: urls per browser invocation
+    parser.add_argument(       '--rate',      type=float)              # urls opened per second (default 0.5, batch 5)
+    parser.add_argument(       '--burst',     type=int)                # urls that may be opened at once (default 1, batch the chunk)
 
-    args = parser.parse_args()                                        # print(args.filename, args.verbose)
+    args = parser.parse_intermixed_args()                             # (options may follow the sub-command words) print(args.filename, args.verbose)
     if args.verbose: print("parsed args", args)
 
     pth = vars(args)['file|folder|glob']
@@ -97,34 +481,60 @@ if __name__ == "__main__":
     if args.verbose: print("selected browser", browser)
 
     if args.verbose: print("determine file or files")
-    if len(pth)==1 and os.path.isdir(pth[0]): files = glob(expanduser(pth[0])+'/*')  # if it's a folder path get (glob) all files in the folder
+    if pth[0]=='scan' and not os.path.exists(pth[0]):                # scan sub-command
+        count = write_scan(scan_url_files([expanduser(root) for root in pth[1:]], workers=args.workers), fmt='jsonl' if args.jsonl else 'tsv')
+        if args.verbose: print(count, "url files scanned", file=sys.stderr)
+        sys.exit(0)
+    if pth[0]=='check' and not os.path.exists(pth[0]):               # check sub-command
+        checked, dead = check_links([expanduser(p) for p in pth[1:]], expanduser(args.checkDb), args.ttl, args.concurrency, args.perHost,
+                                    args.timeout, deadOnly=args.dead, writeMeta=not args.noMeta, workers=args.workers)
+        print(checked, "urls checked,", dead, "dead", file=sys.stderr)
+        sys.exit(0)
+    if pth[0] in ('index', 'search') and not os.path.exists(pth[0]):  # index/search sub-commands
+        index = BookmarkIndex(expanduser(args.db))
+        if pth[0]=='index':
+            for root in pth[1:]: print(index_tree(index, expanduser(root)), "url files indexed in", root)
+            index.close()
+            sys.exit(0)
+        hits = index.search(" ".join(pth[1:]), limit=args.limit)
+        index.close()
+        for path, title, url, folder, added, visited in hits: print(f"{(added or '')[:10]:10}  {title}  [{folder}]  {path}")
+        if args.list or not hits: sys.exit(0 if hits else 1)
+        files = [hit[0] for hit in hits]                              # and open (or -u, -t) them as any files
+    elif len(pth)==1 and os.path.isdir(pth[0]): files = glob(expanduser(pth[0])+'/*')  # if it's a folder path get (glob) all files in the folder
     elif os.path.isfile(pth[0]):              files = pth
     else:
         print(f"failed to interpret {pth}")
         sys.exit(1)
 
-    for fl in [expanduser(f) for f in files]:
-      if args.list:                                                   # type out the name of the file
-        print(fl)
-      elif args.type:                                                 # type out the contents of the file
-        print("---",fl)
-        for l in open(fl): print(l, end='')
-        print()
-      elif args.url:                                                  # print the embedded url
-        print("---",fl)
-        print("URL=", get_url_file(fl))
-      else:
-        url = get_url_file(fl)
-        print(fl, ":URL=", url)
-        if not args.noLog:
-          with open(browseLogFile, 'a') as blf:
-            print(f"DATE={dt}, ", file=blf, end='')
-            print(f"URL={url}, ", file=blf, end='')
-            print(f"FILE={fl}",   file=blf, end='')
-            print(f"",            file=blf)
-        os.system("sleep 2") # guard against recursively invoking the browser (tabs)! ad infinitum
-        subprocess.run([browser, url], check=True, stderr=open(stderrFile, 'w'), text=True)
-        if args.verbose: print(f"DATE={dt}, URL={url}")
+    files = [expanduser(f) for f in files]
+    if args.list or args.type or args.url:
+      for fl in files:
+        if args.list:                                                 # type out the name of the file
+          print(fl)
+        elif args.type:                                               # type out the contents of the file
+          print("---",fl)
+          for l in open(fl): print(l, end='')
+          print()
+        elif args.url:                                                # print the embedded url
+          print("---",fl)
+          print("URL=", get_url_file(fl))
+      sys.exit(0)
+
+    if args.batch:                                                    # read all the urls first
+      with ThreadPoolExecutor(max_workers=args.workers) as pool: urls = list(pool.map(get_url_file, files))
+    else:
+      urls = [get_url_file(fl) for fl in files]
+    opened = [(fl, url) for fl, url in zip(files, urls) if url]
+    for fl, url in zip(files, urls): print(fl, ":URL=", url)
+    if not args.noLog: log_urls(opened)
+
+    chunk  = max(args.chunk, 1) if args.batch and browser!='xdg-open' else 1  # (xdg-open takes a single url)
+    rate   = args.rate  or (5.0 if args.batch else 0.5)
+    burst  = args.burst or chunk
+    bucket = TokenBucket(rate, burst, full=browser!='xdg-open')       # guard against recursively invoking the browser (tabs)! ad infinitum, xdg-open may run this script
+    open_urls(browser, [url for fl, url in opened], chunk=chunk, bucket=bucket, wait=not args.batch)
+    if args.verbose: print(f"DATE={dt}, {len(opened)} urls opened")
 
 # TBD inspect first lines for:  "<!doctype html><html..."
 # TBD - if it's a folder open all bookmark files in the folder!